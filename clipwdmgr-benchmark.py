@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Benchmarks for clipwdmgr internals using synthetic accounts. Run from source tree."""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from clipwdmgr import clipwdmgr
+from clipwdmgr.globals import *
+from clipwdmgr.globals import GlobalVariables
+from clipwdmgr.crypto.crypto import createKey,createDataKey,getCipher
+from clipwdmgr.database import database
+from clipwdmgr.database.records import encodeAccountRow,decodeRecord,getRecordDefaults
+from clipwdmgr.utils.functions import makeAccountString
+from clipwdmgr.utils.utils import createNewFile
+from clipwdmgr.utils.settings import Settings
+
+
+def syntheticAccountStrings(total):
+    return [makeAccountString(account) for account in syntheticAccounts(total)]
+
+def syntheticAccounts(total):
+    accounts=[]
+    for i in range(total):
+        account=dict()
+        account[COLUMN_CREATED]="2020-01-01 00:00:00.%06d" % i
+        account[COLUMN_UPDATED]="2020-01-01 00:00:00"
+        account[COLUMN_NAME]="account%06d" % i
+        account[COLUMN_URL]="https://host%d.example.com/login" % i
+        account[COLUMN_USERNAME]="user%d" % i
+        account[COLUMN_EMAIL]="user%d@example.com" % i
+        account[COLUMN_PASSWORD]="Pwd/%04d/Abcd" % (i % 10000)
+        account[COLUMN_COMMENT]="Synthetic account number %d, ticket TCK-%d." % (i,i*7)
+        account[COLUMN_ID]=i+1
+        accounts.append(account)
+    return accounts
+
+def timeIt(function,*args):
+    start=time.perf_counter()
+    function(*args)
+    return time.perf_counter()-start
+
+def legacyInsertAccountsToDB(accountStrings):
+    #row by row insert as done before version 0.18
+    for accountString in accountStrings:
+        accountDict=database.accountStringToDict(accountString)
+        columnNames=[]
+        values=[]
+        for key in accountDict.keys():
+            value=accountDict[key]
+            if value != "":
+                columnNames.append(key)
+                values.append(value)
+        sql="insert into accounts (%s) values (%s)" % (",".join(columnNames),",".join(["?"]*len(values)))
+        database.DATABASE_CURSOR.execute(sql,values)
+    database.DATABASE.commit()
+
+def benchmarkInsert(sizes):
+    print("Insert accounts to database")
+    print("{:>10} {:>12} {:>12}".format("accounts","row by row","bulk"))
+    for size in sizes:
+        accounts=syntheticAccountStrings(size)
+        results=[]
+        for insertFunction in [legacyInsertAccountsToDB,database.insertAccountsToDB]:
+            database.closeDatabase()
+            database.openDatabase()
+            results.append(timeIt(insertFunction,accounts))
+        print("{:>10} {:>11.3f}s {:>11.3f}s".format(size,results[0],results[1]))
+    database.closeDatabase()
+
+def loadSyntheticAccounts(accounts):
+    database.closeDatabase()
+    database.openDatabase()
+    database.dropIndexes()
+    database.insertAccountsToDB(accounts)
+    database.createIndexes()
+    database.analyzeDatabase()
+
+def benchmarkSubstring(sizes,queries=200):
+    print("Substring search of %d random URL and comment substrings" % queries)
+    print("{:>10} {:>12} {:>12} {:>12}".format("accounts","load","scan","trigram"))
+    for size in sizes:
+        accounts=syntheticAccountStrings(size)
+        start=time.perf_counter()
+        loadSyntheticAccounts(accounts)
+        loadTime=time.perf_counter()-start
+        searches=[]
+        for i in range(queries):
+            n=random.randrange(size)
+            searches.append(random.choice([(COLUMN_URL,"st%d.exa" % n),(COLUMN_COMMENT,"TCK-%d." % (n*7))]))
+        results=[]
+        for trigram in [False,True]:
+            database.TRIGRAM_AVAILABLE=trigram
+            start=time.perf_counter()
+            for (column,value) in searches:
+                database.executeQuery(database.Query([COLUMN_NAME]).contains(column,value)).fetchall()
+            results.append(time.perf_counter()-start)
+        print("{:>10} {:>11.3f}s {:>11.3f}s {:>11.3f}s".format(size,loadTime,results[0],results[1]))
+    database.closeDatabase()
+
+def benchmarkCipher(sizes):
+    print("Encrypt accounts and write password file, load password file to database")
+    print("{:>10} {:>18} {:>12} {:>12} {:>12} {:>12}".format("accounts","cipher","encrypt","decrypt","load","file size"))
+    key=createKey("benchmark")
+    GlobalVariables.KEY=key
+    GlobalVariables.CLI_PASSWORD_FILE=passwordFile=os.path.join(GlobalVariables.CLIPWDMGR_DATA_DIR,CLIPWDMGR_ACCOUNTS_FILE_NAME)
+    #compare ciphers in single process
+    Settings().set(SETTING_DECRYPT_WORKERS,1)
+    for size in sizes:
+        accounts=[encodeAccountRow(account) for account in syntheticAccounts(size)]
+        for cipher in [CIPHER_FERNET,CIPHER_AES_GCM,CIPHER_CHACHA20_POLY1305]:
+            dataKey=createDataKey()
+            vaultCipher=getCipher(dataKey,cipher)
+            start=time.perf_counter()
+            tokens=vaultCipher.encrypt_many(accounts)
+            createNewFile(passwordFile,[database.makeVaultHeader(key,dataKey,database.getVaultKdf(),cipher)]+[token.decode("utf-8") for token in tokens])
+            encryptTime=time.perf_counter()-start
+            decryptTime=timeIt(vaultCipher.decrypt_many,tokens)
+            database.closeDatabase()
+            database.openDatabase()
+            loadTime=timeIt(database.loadAccounts,key)
+            print("{:>10} {:>18} {:>11.3f}s {:>11.3f}s {:>11.3f}s {:>12}".format(size,cipher,encryptTime,decryptTime,loadTime,os.path.getsize(passwordFile)))
+    database.closeDatabase()
+
+def benchmarkCodec(sizes):
+    print("Decode account records to insert tuples")
+    print("{:>10} {:>12} {:>12} {:>12} {:>12}".format("accounts","text","binary","text size","binary size"))
+    defaults=getRecordDefaults("2020-01-01 00:00:00")
+    for size in sizes:
+        accounts=syntheticAccounts(size)
+        textRecords=[makeAccountString(account).encode("utf-8") for account in accounts]
+        binaryRecords=[encodeAccountRow(account) for account in accounts]
+        results=[]
+        for records in [textRecords,binaryRecords]:
+            start=time.perf_counter()
+            for record in records:
+                decodeRecord(record,defaults)
+            results.append(time.perf_counter()-start)
+        print("{:>10} {:>11.3f}s {:>11.3f}s {:>12} {:>12}".format(size,results[0],results[1],sum([len(r) for r in textRecords]),sum([len(r) for r in binaryRecords])))
+
+BENCHMARKS={
+    "insert":benchmarkInsert,
+    "substring":benchmarkSubstring,
+    "cipher":benchmarkCipher,
+    "codec":benchmarkCodec,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='CLI Password Manager benchmarks.')
+    parser.add_argument('-s','--sizes', type=int, nargs='+', default=[1000,10000,100000], help='Number of synthetic accounts.')
+    parser.add_argument('benchmark', nargs='*', help='Benchmarks to run: %s. Default is all.' % ", ".join(BENCHMARKS.keys()))
+    args = parser.parse_args()
+    benchmarks=args.benchmark
+    if not benchmarks:
+        benchmarks=list(BENCHMARKS.keys())
+    for name in benchmarks:
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark: %s" % name)
+    with tempfile.TemporaryDirectory() as dataDir:
+        #settings are read from temporary directory
+        GlobalVariables.CLIPWDMGR_DATA_DIR=dataDir
+        for name in benchmarks:
+            BENCHMARKS[name](args.sizes)
+            print()
+
+
+if __name__ == '__main__':
+    main()
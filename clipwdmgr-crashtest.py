@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Fault injection for password file writes. Run from source tree, requires os.fork."""
+
+import argparse
+import contextlib
+import errno
+import io
+import os
+import random
+import tempfile
+
+from clipwdmgr import clipwdmgr
+from clipwdmgr.globals import *
+from clipwdmgr.globals import GlobalVariables
+from clipwdmgr.crypto.crypto import createKey,createDataKey,getCipher,InvalidToken
+from clipwdmgr.database import database
+from clipwdmgr.utils import atomicfile
+from clipwdmgr.utils.utils import createNewFile,appendStringToFile
+from clipwdmgr.utils.settings import Settings
+from clipwdmgr.database.records import encodeAccountRow
+
+
+def encryptedAccounts(key,cipher,first,total):
+    accounts=[]
+    for i in range(first,first+total):
+        account=dict()
+        account[COLUMN_CREATED]="2020-01-01 00:00:00.%06d" % i
+        account[COLUMN_UPDATED]="2020-01-01 00:00:00"
+        account[COLUMN_NAME]="account%06d" % i
+        account[COLUMN_PASSWORD]="Pwd/%04d/Abcd" % i
+        account[COLUMN_ID]=i+1
+        accounts.append(encodeAccountRow(account))
+    return [token.decode("utf-8") for token in getCipher(key,cipher).encrypt_many(accounts)]
+
+def writeWithFault(write,offset,fault):
+    #write in child process that stops after writing offset bytes
+    #kill exits child immediately, full raises disk full error
+    pid=os.fork()
+    if pid==0:
+        def faultyWriteBytes(file,data):
+            file.write(data[:offset])
+            file.flush()
+            if fault=="kill":
+                os._exit(1)
+            raise OSError(errno.ENOSPC,os.strerror(errno.ENOSPC))
+        atomicfile.writeBytes=faultyWriteBytes
+        try:
+            write()
+        except OSError:
+            os._exit(2)
+        os._exit(0)
+    os.waitpid(pid,0)
+
+def countAccounts(key):
+    database.closeDatabase()
+    database.openDatabase()
+    #ignore messages about removed incomplete appends
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            if database.loadAccounts(key)==False:
+                return 0
+        except InvalidToken:
+            return "undecryptable"
+    return database.selectFirst("select count(*) from accounts")
+
+def main():
+    parser = argparse.ArgumentParser(description='CLI Password Manager fault injection for password file writes.')
+    parser.add_argument('-i','--iterations', type=int, default=200, help='Number of faults injected per test.')
+    parser.add_argument('-a','--accounts', type=int, default=100, help='Number of accounts in password file.')
+    parser.add_argument('--durable', action='store_true', help='Use durable appends.')
+    args = parser.parse_args()
+    failures=0
+    key=createKey("crashtest")
+    with tempfile.TemporaryDirectory() as dataDir:
+        GlobalVariables.CLIPWDMGR_DATA_DIR=dataDir
+        GlobalVariables.CLI_PASSWORD_FILE=passwordFile=os.path.join(dataDir,CLIPWDMGR_ACCOUNTS_FILE_NAME)
+        GlobalVariables.KEY=key
+        Settings().set(SETTING_DURABLE_APPENDS,args.durable)
+        dataKey=createDataKey()
+        cipher=database.getNewVaultCipher()
+        header=database.makeVaultHeader(key,dataKey,database.getVaultKdf(),cipher)
+        accounts=encryptedAccounts(dataKey,cipher,0,args.accounts)
+        appended=encryptedAccounts(dataKey,cipher,args.accounts,5)
+        #test name: (write function, bytes written, accounts after write)
+        tests={
+            #rewrite with one account less, password file has old or new accounts
+            "rewrite":(lambda: createNewFile(passwordFile,[header]+accounts[1:]),len("\n".join([header]+accounts[1:])),[args.accounts,args.accounts-1]),
+            #append many accounts at once, none or all of them are added
+            "append":(lambda: appendStringToFile(passwordFile,"\n".join(appended)),len("\n".join(appended))+1,[args.accounts,args.accounts+len(appended)]),
+            }
+        for (name,(write,size,expectedCounts)) in tests.items():
+            for fault in ["kill","full"]:
+                errors=0
+                strayFiles=0
+                for i in range(args.iterations):
+                    createNewFile(passwordFile,[header]+accounts)
+                    writeWithFault(write,random.randrange(size),fault)
+                    count=countAccounts(key)
+                    if count not in expectedCounts:
+                        errors=errors+1
+                        print("%s %s: %s accounts, expected %s" % (name,fault,count," or ".join([str(c) for c in expectedCounts])))
+                    #loading removes temporary files and append marker of stopped writer
+                    files=[f for f in os.listdir(dataDir) if f.startswith(".") or f.endswith(atomicfile.APPEND_MARKER_SUFFIX)]
+                    if files:
+                        strayFiles=strayFiles+len(files)
+                        print("%s %s: files left after loading: %s" % (name,fault,", ".join(files)))
+                        for f in files:
+                            os.remove(os.path.join(dataDir,f))
+                print("{:<8} {:<5} {:>5} faults {:>5} errors {:>5} temporary files left".format(name,fault,args.iterations,errors,strayFiles))
+                failures=failures+errors+strayFiles
+        database.closeDatabase()
+    if failures>0:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
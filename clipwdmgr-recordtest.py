@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Round trip checks for account records. Run from source tree."""
+
+import argparse
+import random
+
+from clipwdmgr import clipwdmgr
+from clipwdmgr.globals import *
+from clipwdmgr.database.records import encodeAccountRow,decodeRecord,getRecordDefaults,compressRecord,decompressRecord,isCompressedRecord,RECORD_COMPRESSION_METHODS
+from clipwdmgr.utils.functions import makeAccountString
+
+
+DEFAULTS=getRecordDefaults("2020-01-01 00:00:00")
+OPERATIONS=[None,JOURNAL_UPSERT,JOURNAL_DELETE]
+#(compression method, minimum record size), minimum size 0 compresses every record that gets smaller
+COMPRESSIONS=[None,(COMPRESSION_NONE,0)]+[(method,0) for method in RECORD_COMPRESSION_METHODS.keys()]
+
+#values that binary records must keep, leading and trailing whitespace is stripped when encoding
+BINARY_VALUES=["",":",FIELD_DELIM,"\n"," ","|","NAME:","äö","€","\U0001f511","x"*3000,"0.5"]
+#text records of previous versions can not have field delimiter or line feed in values
+TEXT_VALUES=["",":"," ","NAME:","äö","€","\U0001f511","x"*3000,"0.5"]
+
+def fixedAccounts(values):
+    #empty account, accounts with one value in every field and with every field empty
+    accounts=[dict()]
+    for value in values:
+        accounts.append(dict([(column,value) for column in DATABASE_ACCOUNTS_TABLE_COLUMNS]))
+    accounts.append(dict([(column,values[i % len(values)]) for (i,column) in enumerate(DATABASE_ACCOUNTS_TABLE_COLUMNS)]))
+    return accounts
+
+def randomAccount(values):
+    account=dict()
+    for column in DATABASE_ACCOUNTS_TABLE_COLUMNS:
+        if random.random()<0.9:
+            account[column]="".join([random.choice(values) for i in range(random.randrange(0,6))])
+    return account
+
+def expectedValues(account,strip):
+    #missing and empty fields get default values
+    values=[]
+    for (column,default) in zip(DATABASE_ACCOUNTS_TABLE_COLUMNS,DEFAULTS):
+        value=account.get(column,"")
+        if strip:
+            value=value.strip()
+        values.append(value if value!="" else default)
+    return tuple(values)
+
+def compressedRecords(record):
+    #record and its compressed versions, compressed record must decompress to record
+    records=[]
+    for compression in COMPRESSIONS:
+        if compression is None:
+            records.append(record)
+            continue
+        compressedRecord=compressRecord(record,*compression)
+        if len(compressedRecord)>len(record) or isCompressedRecord(compressedRecord)!=(compressedRecord!=record):
+            return None
+        if decompressRecord(compressedRecord)!=record:
+            return None
+        records.append(compressedRecord)
+    return records
+
+def checkBinaryRecord(account,operation):
+    expected=(operation,expectedValues(account,True))
+    records=compressedRecords(encodeAccountRow(account,operation=operation))
+    return records is not None and all([decodeRecord(record,DEFAULTS)==expected for record in records])
+
+def checkTextRecord(account,operation):
+    if operation is not None:
+        account=dict(account)
+        account[JOURNAL_FIELD]=operation
+    if len(account)==0:
+        #empty lines are skipped when loading
+        return True
+    expected=(operation,expectedValues(account,False))
+    records=compressedRecords(makeAccountString(account).encode("utf-8"))
+    return records is not None and all([decodeRecord(record,DEFAULTS)==expected for record in records])
+
+def runCheck(name,check,accounts):
+    errors=0
+    records=0
+    for account in accounts:
+        for operation in OPERATIONS:
+            records=records+1
+            try:
+                passed=check(account,operation)
+            except Exception as e:
+                print("%s %s: %s" % (name,operation,repr(e)))
+                passed=False
+            if not passed:
+                errors=errors+1
+                if errors<=5:
+                    print("%s %s: round trip failed: %r" % (name,operation,account))
+    print("{:<14} {:>7} records {:>5} errors".format(name,records,errors))
+    return errors
+
+def main():
+    parser = argparse.ArgumentParser(description='CLI Password Manager account record round trip checks.')
+    parser.add_argument('-n','--accounts', type=int, default=500, help='Number of random accounts.')
+    parser.add_argument('--seed', type=int, help='Random seed.')
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    checks=[
+        ("binary",checkBinaryRecord,fixedAccounts(BINARY_VALUES)),
+        ("binary random",checkBinaryRecord,[randomAccount(BINARY_VALUES) for i in range(args.accounts)]),
+        ("text",checkTextRecord,fixedAccounts(TEXT_VALUES)),
+        ("text random",checkTextRecord,[randomAccount(TEXT_VALUES) for i in range(args.accounts)]),
+        ]
+    failures=0
+    for (name,check,accounts) in checks:
+        failures=failures+runCheck(name,check,accounts)
+    if failures>0:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -38,33 +38,29 @@
 
 __version__="0.17"
 
+import time
+#start time for --timings
+STARTUP_TIME=time.perf_counter()
+
 import sys
 import os
-import json
-import shutil
-import shlex
 import argparse
-import subprocess
-import random
-
-from prompt_toolkit import prompt
-from prompt_toolkit.styles import Style
-from prompt_toolkit.history import FileHistory
-from prompt_toolkit.shortcuts import set_title, CompleteStyle
-from prompt_toolkit.completion import WordCompleter
 
+#prompt_toolkit, commands, crypto and database are imported when needed
+#so that -c and -d start fast, see STARTUP_TIME_BUDGET
 from .globals import *
-from .crypto.crypto import *
 from .utils.utils import *
-from .utils.keybindings import *
-from .commands.CommandHandler import CommandHandler
+from .utils.agent import *
+from .utils.timings import *
 from .globals import GlobalVariables
 
+addTiming("imports",STARTUP_TIME)
+
 #command line args
 args=None
 
-#command history
-cmdHistoryFile=FileHistory("%s/%s" % (os.environ.get(CLIPWDMGR_DATA_DIR),"cmd_history.txt"))
+#command history, created when interface starts
+cmdHistoryFile=None
 #command completer for prompt
 cmdCompleter=None
 
@@ -72,19 +68,22 @@ cmdCompleter=None
 keyBindings=None
 
 #style for toolbar
-style = Style.from_dict({
+style=None
+STYLE_DICT={
         'bottom-toolbar':      '#000000 bg:#ffffff',
         #'bottom-toolbar':      '#aaaa00 bg:#000000',
         #'bottom-toolbar.text': '#aaaa44 bg:#aa4444',
         #'bottom-toolbar':      '#000000 bg:#000000',
         #'bottom-toolbar.text': '#000000 bg:#000000',
-    })
+    }
 
 #toolbar
 def bottom_toolbar():
 
     clipboardText="-"
-    if getClipboardText() == GlobalVariables.REAL_CONTENT_OF_CLIPBOARD:
+    if hasClipboardCopyFailed():
+        clipboardText="error copying %s" % GlobalVariables.COPIED_TO_CLIPBOARD
+    elif getClipboardText() == GlobalVariables.REAL_CONTENT_OF_CLIPBOARD:
         clipboardText=GlobalVariables.COPIED_TO_CLIPBOARD
     
     #programName="%s v%s" % (PROGRAMNAME, __version__)
@@ -103,6 +102,10 @@ def parseCommandLineArgs():
     parser.add_argument('-d','--decrypt', nargs=1, metavar='STR',help='Decrypt single account string.')
     parser.add_argument('-v,--version', action='version', version="%s v%s" % (PROGRAMNAME, __version__))
     parser.add_argument('--passphrase', nargs=1, metavar='STR',help='Passphrase.')
+    parser.add_argument('--agent', action='store_true', help='Start background agent that keeps password file unlocked for -c and -d.')
+    parser.add_argument('--agent-stop', action='store_true', help='Stop background agent.')
+    parser.add_argument('--no-agent', action='store_true', help='Do not use background agent.')
+    parser.add_argument('--timings', action='store_true', help='Print startup timings to stderr.')
     
     global args
     args = parser.parse_args()
@@ -112,28 +115,40 @@ def error():
     print(traceback.format_exc())
 
 def myPrompt():
+    from prompt_toolkit import prompt
     return prompt(PROMPTSTRING,
             history=cmdHistoryFile,
             completer=cmdCompleter,
             complete_while_typing=False,
             #complete_style=CompleteStyle.READLINE_LIKE,
             bottom_toolbar=bottom_toolbar, 
+            #redraw toolbar when clipboard monitor has read clipboard
+            refresh_interval=float(Settings().get(SETTING_CLIPBOARD_POLL_INTERVAL)),
             style=style,
             key_bindings=keyBindings)
     #toolbar does not work when using cygwin
 
 def main_clipwdmgr():
+    from prompt_toolkit.styles import Style
+    from prompt_toolkit.history import FileHistory
+    from prompt_toolkit.completion import WordCompleter
+    from .commands.CommandHandler import CommandHandler
+
     programName="%s v%s" % (PROGRAMNAME, __version__)
     #set_title(programName)
 
-    #set version as global variable
-    GlobalVariables.VERSION=__version__
+    global cmdHistoryFile,style
+    cmdHistoryFile=FileHistory("%s/%s" % (GlobalVariables.CLIPWDMGR_DATA_DIR,"cmd_history.txt"))
+    style=Style.from_dict(STYLE_DICT)
 
     cmdHandler=CommandHandler()
+
+    #toolbar shows clipboard content read by clipboard monitor
+    startClipboardMonitor(float(Settings().get(SETTING_CLIPBOARD_POLL_INTERVAL)),Settings().get(SETTING_CLIPBOARD_BACKEND))
     
     #set command completer
     global cmdCompleter
-    cmdCompleter=WordCompleter(cmdHandler.cmdNameList)
+    cmdCompleter=WordCompleter(cmdHandler.getCommandNames())
     
     userInput=myPrompt()
     while userInput!="exit":
@@ -150,6 +165,7 @@ def main_clipwdmgr():
 
 def initVariables():
     #init global variables
+    GlobalVariables.VERSION=__version__
     GlobalVariables.COPIED_TO_CLIPBOARD="-"
     GlobalVariables.REAL_CONTENT_OF_CLIPBOARD="-"
     
@@ -180,12 +196,15 @@ def checkEnv():
 
 #get key to be used to encrypt and decrypt
 def getKey():
-    
+    with timing("import crypto"):
+        from .crypto.crypto import createKey,askPassphrase
+
     if args.passphrase:
         GlobalVariables.KEY=createKey(args.passphrase[0])
     else:
         try:
-            GlobalVariables.KEY=askPassphrase("Passphrase: ")
+            with timing("passphrase"):
+                GlobalVariables.KEY=askPassphrase("Passphrase: ")
         except KeyboardInterrupt:
             sys.exit(1)
     
@@ -197,21 +216,111 @@ def getKey():
 def executeCommandLineArgs():
 
     if args.decrypt:
+        from .crypto.crypto import decryptString
         account=args.decrypt[0]
-        print(decryptString(GlobalVariables.KEY,account))
+        with timing("execute"):
+            print(decryptString(GlobalVariables.KEY,account))
         return True
 
     if args.cmd:
-        cmdHandler=CommandHandler()
-        for cmd in args.cmd:
-            print(">%s" % cmd)
-            cmdHandler.execute(cmd)
-            print()
+        #program exits after commands, clipboard would be cleared right after copy
+        setClearClipboardOnExit(False)
+        with timing("import commands"):
+            from .commands.CommandHandler import CommandHandler
+            cmdHandler=CommandHandler()
+        with timing("execute"):
+            executeCommands(cmdHandler,args.cmd)
         return True
 
     return False
 
-    
+def executeCommands(cmdHandler,commands):
+    for cmd in commands:
+        print(">%s" % cmd)
+        cmdHandler.execute(cmd)
+        print()
+
+#forward command line args to agent
+#returns False if agent is not used
+def executeCommandLineArgsInAgent():
+
+    if args.agent_stop:
+        response=sendAgentRequest({"stop":True})
+        if response == None:
+            print("Agent is not running.")
+        else:
+            print(response["output"],end="")
+        return True
+
+    if args.agent or args.no_agent:
+        return False
+
+    if args.passphrase:
+        #agent uses the key it was started with, given passphrase must not be bypassed
+        return False
+
+    if args.decrypt:
+        request={"decrypt":args.decrypt[0]}
+    elif args.cmd and not any(isInteractiveCommand(cmd) for cmd in args.cmd):
+        request={"cmd":args.cmd}
+    else:
+        return False
+    if args.file:
+        request["file"]=os.path.abspath(args.file[0])
+
+    with timing("agent request"):
+        response=sendAgentRequest(request)
+    if response == None:
+        #agent not running
+        return False
+    print(response["output"],end="")
+    return True
+
+#load password file and serve requests from command line calls until idle timeout
+def startAgent():
+    from .crypto.crypto import decryptString,InvalidToken
+    from .database.database import openDatabase,loadAccounts
+    from .commands.CommandHandler import CommandHandler
+
+    if sendAgentRequest({"ping":True}) != None:
+        print("Agent is already running.")
+        return
+
+    cmdHandler=CommandHandler()
+    passwordFile=os.path.abspath(GlobalVariables.CLI_PASSWORD_FILE)
+
+    #load password file before detaching so that wrong passphrase is noticed
+    openDatabase()
+    try:
+        loadAccounts(GlobalVariables.KEY)
+    except InvalidToken:
+        print("Wrong passphrase.")
+        sys.exit(3)
+
+    def executeAgentRequest(request):
+        GlobalVariables.CLI_PASSWORD_FILE=request.get("file",passwordFile)
+        if "decrypt" in request:
+            print(decryptString(GlobalVariables.KEY,request["decrypt"]))
+        commands=request.get("cmd",[])
+        for cmd in commands:
+            if isInteractiveCommand(cmd):
+                print("Command '%s' is not available in agent." % cmd)
+                return
+        executeCommands(cmdHandler,commands)
+
+    idleTimeout=Settings().getInt(SETTING_AGENT_IDLE_TIMEOUT)
+    createAgentDirectory()
+    print("Agent started. Socket: %s" % getAgentSocketFile())
+    sys.stdout.flush()
+    if daemonize():
+        runAgent(executeAgentRequest,idleTimeout)
+        exitClipboardService()
+        os._exit(0)
+
+def printStartupTimings(mode):
+    if args.timings:
+        #passphrase prompt waits for user and decryption depends on size of password file
+        printTimings(mode,STARTUP_TIME_BUDGET[mode],excludedPhases=["passphrase","execute"])
 
 def main():
 
@@ -234,16 +343,33 @@ def main():
     print(programName)
 
 
+    if args.timings:
+        startTimings(STARTUP_TIME)
+
+    if executeCommandLineArgsInAgent() == True:
+        printStartupTimings("agent")
+        return
+
     getKey()
 
     if args.file:
         #set specified password file
         GlobalVariables.CLI_PASSWORD_FILE=args.file[0]
 
-    if executeCommandLineArgs() == False:
+    if args.agent:
+        startAgent()
+        return
+
+    if executeCommandLineArgs() == True:
+        if args.decrypt:
+            printStartupTimings("decrypt")
+        else:
+            printStartupTimings("cmd")
+    else:
         #did not execute any command line args
         #start interface
         try:
+            from .utils.keybindings import setKeyBindings
             global keyBindings
             keyBindings=setKeyBindings()
             main_clipwdmgr()
@@ -24,7 +24,6 @@
 #
 #add command
 #
-from prompt_toolkit import prompt
 
 from ..utils.utils import *
 from ..utils.functions import *
@@ -76,11 +75,18 @@ class AddAccountCommand(SuperCommand):
         newAccount[COLUMN_COMMENT]=comment
         newAccount[COLUMN_CREATED]=timestamp
         newAccount[COLUMN_UPDATED]=timestamp
-        newAccount[COLUMN_ID]=generateNewID()
+        try:
+            newAccount[COLUMN_ID]=generateNewID()
+        except AccountIdsExhaustedError as e:
+            printError("%s Increase %s setting." % (e,SETTING_MAX_ID))
+            return
         accountString=makeAccountString(newAccount)
         debug(accountString)
 
-        createPasswordFileBackups()
-        insertAccountToFile(encryptionKey,accountString)
+        if Settings().get(SETTING_VAULT_FORMAT)!=VAULT_FORMAT_JOURNAL:
+            #journal appends are undone using append marker if they do not complete,
+            #password file is backed up when it is compacted
+            createPasswordFileBackups()
+        insertAccountToFile(encryptionKey,newAccount)
 
         print("Account added.")
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+#The MIT License (MIT)
+#
+#Copyright (c) 2015,2018 Sami Salkosuo
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#THE SOFTWARE.
+#
+#backup-command
+#
+#list, verify and restore password file backups
+#
+
+import os
+from ..crypto.crypto import *
+from ..utils.utils import *
+from ..utils.functions import *
+from ..database.database import *
+from .SuperCommand import *
+from ..globals import *
+from ..globals import GlobalVariables
+from ..utils.settings import Settings
+
+class BackupCommand(SuperCommand):
+
+    def __init__(self,cmd_handler):
+        super().__init__(cmd_handler)
+    
+    
+    def parseCommandArgs(self,userInputList):
+        cmd_parser = ThrowingArgumentParser(prog="backup",description='List, create, verify or restore password file backups. Backups are numbered starting from the newest.')
+        cmd_parser.add_argument('action', metavar='ACTION', type=str, nargs='?', default="list", choices=["list","create","verify","restore"],
+                    help='list, create, verify or restore. Default is list.')
+        cmd_parser.add_argument('backup', metavar='BACKUP', type=str, nargs='?',
+                    help='Backup number or file name. Verify checks all backups if not given.')
+
+        (self.cmd_args,self.help_text)=parseCommandArgs(cmd_parser,userInputList)
+
+    def execute(self):
+        passwordFile=GlobalVariables.CLI_PASSWORD_FILE
+        action=self.cmd_args.action
+        if action=="create":
+            backupFile=createBackup(passwordFile,Settings().getInt(SETTING_MAX_PASSWORD_FILE_BACKUPS))
+            if backupFile==None:
+                print("No password file.")
+            else:
+                print("Backup created: %s" % backupFile)
+            return
+
+        backups=getBackupFiles(passwordFile)
+        if not backups:
+            print("No backups.")
+            return
+
+        if action=="list":
+            for (index,backupFile) in enumerate(backups):
+                print("%3d  %s  %10d  %s" % (index+1,getBackupTimestamp(backupFile,passwordFile).strftime("%Y-%m-%d %H:%M:%S"),os.path.getsize(backupFile),backupFile))
+            return
+
+        if self.cmd_args.backup!=None:
+            backupFile=self.getBackup(backups,self.cmd_args.backup)
+            if backupFile==None:
+                print("Backup %s not found." % self.cmd_args.backup)
+                return
+            backups=[backupFile]
+        elif action=="restore":
+            print("Backup to restore is required.")
+            return
+
+        if action=="verify":
+            for backupFile in backups:
+                print("%s: %s" % (backupFile,self.verifyBackup(backupFile)))
+            return
+
+        #restore, current password file is kept as backup
+        backupFile=backups[0]
+        try:
+            restoreBackup(backupFile,passwordFile,Settings().getInt(SETTING_MAX_PASSWORD_FILE_BACKUPS),self.checkBackupKey)
+        except InvalidToken:
+            print("Backup %s can not be decrypted using current passphrase. Password file not restored." % backupFile)
+            return
+        invalidateVault()
+        print("Password file restored from %s." % backupFile)
+
+    def getBackup(self,backups,backup):
+        #backup number or file name
+        try:
+            index=int(backup)
+            if index>0 and index<=len(backups):
+                return backups[index-1]
+            return None
+        except ValueError:
+            pass
+        for backupFile in backups:
+            if backup==backupFile or backup==os.path.basename(backupFile):
+                return backupFile
+        return None
+
+    def checkBackupKey(self,content):
+        #raises InvalidToken if backup is not encrypted using current passphrase
+        (header,accounts)=splitVaultHeader(content)
+        dataKey=getHeaderDataKey(GlobalVariables.KEY,header)
+        if header is None:
+            #password file without header is encrypted using passphrase key, check first account
+            accounts=[account.strip() for account in accounts.splitlines()]
+            accounts=[account for account in accounts if account!=b""]
+            decryptTokens(dataKey,accounts[:1])
+
+    def verifyBackup(self,backupFile):
+        #decrypt all lines of backup using current passphrase
+        (header,content)=splitVaultHeader(readFileAsBytes(backupFile))
+        accounts=[account.strip() for account in content.splitlines()]
+        accounts=[account for account in accounts if account!=b""]
+        try:
+            decryptedAccounts=decryptAccounts(getHeaderDataKey(GlobalVariables.KEY,header),accounts)
+        except InvalidToken:
+            return "FAILED, can not decrypt using current passphrase"
+        journalEntries=len([account for account in decryptedAccounts if isJournalRecord(account)])
+        if journalEntries>0:
+            return "OK, %d accounts, %d journal entries" % (len(accounts)-journalEntries,journalEntries)
+        return "OK, %d accounts" % len(accounts)
@@ -42,6 +42,7 @@ class ChangePassphraseCommand(SuperCommand):
     def parseCommandArgs(self,userInputList):
 
         cmd_parser = ThrowingArgumentParser(prog="changepassphrase",description='Change passphrase.')
+        cmd_parser.add_argument('-r','--rotate-key', required=False, action='store_true', help='Encrypt all accounts using new data key, so that old passphrase and backups can not decrypt them.')
 
 
         (self.cmd_args,self.help_text)=parseCommandArgs(cmd_parser,userInputList)
@@ -56,7 +57,18 @@ class ChangePassphraseCommand(SuperCommand):
             print("Passphrases do not match.")
             return
 
-        loadAccounts(GlobalVariables.KEY)
-        GlobalVariables.KEY=newKey
-        saveAccounts()
+        if loadAccounts(GlobalVariables.KEY)==False:
+            GlobalVariables.KEY=newKey
+            print ("Passphrase changed.")
+            return
+
+        rewriteVaultHeader(newKey)
         print ("Passphrase changed.")
+        if self.cmd_args.rotate_key:
+            migrateAccounts(getHeaderCipher(readVaultHeader(GlobalVariables.CLI_PASSWORD_FILE)))
+            print("All accounts encrypted using new data key. Backups can still be decrypted using old passphrase.")
+        else:
+            #data key is the same, only its encryption changed
+            print("Accounts are still encrypted using the same data key. Anyone who knows the old passphrase")
+            print("and has a backup or copy of the password file can decrypt the data key and so also later")
+            print("versions of the password file. Use 'changepassphrase -r' to encrypt all accounts using new data key.")
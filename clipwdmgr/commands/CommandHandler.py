@@ -23,60 +23,110 @@
 #THE SOFTWARE.
 #
 #Handle/execute user commands
-import shutil
 import shlex
-
-from .UserNameCommand import *
-from .PasswordCommand import *
-from .HelpCommand import *
-from .ViewAccountCommand import *
-from .ChangePassphraseCommand import *
-from .ExitCommand import *
-from .ListCommand import *
-from .SettingsCommand import *
-from .DecryptCommand import *
-from .EncryptCommand import *
-from .AddAccountCommand import *
-from .DeleteCommand import *
-from .EditCommand import *
-from .SearchCommand import *
-from .SelectCommand import *
-from .CopyCommand import *
-from .InfoCommand import *
-
+import importlib
 
 from ..globals import *
-from ..crypto.crypto import *
-from ..utils.utils import *
 from ..database.database import *
 
+#built-in commands: command name -> module:class
+#command modules are imported when command is used first time
+COMMAND_MODULES={
+    "uname":".UserNameCommand:UserNameCommand",
+    "pwd":".PasswordCommand:PasswordCommand",
+    "help":".HelpCommand:HelpCommand",
+    "view":".ViewAccountCommand:ViewAccountCommand",
+    "changepassphrase":".ChangePassphraseCommand:ChangePassphraseCommand",
+    "exit":".ExitCommand:ExitCommand",
+    "list":".ListCommand:ListCommand",
+    "settings":".SettingsCommand:SettingsCommand",
+    "decrypt":".DecryptCommand:DecryptCommand",
+    "encrypt":".EncryptCommand:EncryptCommand",
+    "add":".AddAccountCommand:AddAccountCommand",
+    "delete":".DeleteCommand:DeleteCommand",
+    "edit":".EditCommand:EditCommand",
+    "search":".SearchCommand:SearchCommand",
+    "select":".SelectCommand:SelectCommand",
+    "copy":".CopyCommand:CopyCommand",
+    "info":".InfoCommand:InfoCommand",
+    "compact":".CompactCommand:CompactCommand",
+    "backup":".BackupCommand:BackupCommand",
+    "kdf-calibrate":".KdfCalibrateCommand:KdfCalibrateCommand",
+    "migrate":".MigrateCommand:MigrateCommand",
+}
+
+#third party commands are registered as entry points in this group, for example in setup.py:
+#entry_points={"clipwdmgr.commands":["mycmd = mypackage.MyCommand:MyCommand"]}
+#command class extends SuperCommand, built-in commands can not be replaced
+COMMAND_ENTRY_POINT_GROUP="clipwdmgr.commands"
 
+#entry point commands, read when needed
+PLUGIN_COMMAND_MODULES=None
+
+#help metadata by command name: (usage, description)
+#shared by all command handlers, so command parsers are built only once
+COMMAND_METADATA={}
+
+def getPluginCommandModules():
+    global PLUGIN_COMMAND_MODULES
+    if PLUGIN_COMMAND_MODULES == None:
+        PLUGIN_COMMAND_MODULES={}
+        try:
+            from importlib.metadata import entry_points
+        except ImportError:
+            #python < 3.8, no third party commands
+            return PLUGIN_COMMAND_MODULES
+        try:
+            entryPoints=entry_points(group=COMMAND_ENTRY_POINT_GROUP)
+        except TypeError:
+            #python < 3.10
+            entryPoints=entry_points().get(COMMAND_ENTRY_POINT_GROUP,[])
+        for entryPoint in entryPoints:
+            if entryPoint.name not in COMMAND_MODULES:
+                PLUGIN_COMMAND_MODULES[entryPoint.name]=entryPoint.value
+    return PLUGIN_COMMAND_MODULES
+
+def getCommandModule(cmdName):
+    modulePath=COMMAND_MODULES.get(cmdName)
+    if modulePath == None:
+        modulePath=getPluginCommandModules().get(cmdName)
+    return modulePath
 
 #CommandHandler class to handle user input 
 class CommandHandler:
     
     def __init__(self):
+        #command objects are created when used first time
         self.commands={}
-        self.commands["uname"]=UserNameCommand(self)
-        self.commands["pwd"]=PasswordCommand(self)
-        self.commands["help"]=HelpCommand(self)
-        self.commands["view"]=ViewAccountCommand(self)
-        self.commands["changepassphrase"]=ChangePassphraseCommand(self)
-        self.commands["exit"]=ExitCommand(self)
-        self.commands["list"]=ListCommand(self)
-        self.commands["settings"]=SettingsCommand(self)
-        self.commands["decrypt"]=DecryptCommand(self)
-        self.commands["encrypt"]=EncryptCommand(self)
-        self.commands["add"]=AddAccountCommand(self)
-        self.commands["delete"]=DeleteCommand(self)
-        self.commands["edit"]=EditCommand(self)
-        self.commands["search"]=SearchCommand(self)
-        self.commands["select"]=SelectCommand(self)
-        self.commands["copy"]=CopyCommand(self)
-        self.commands["info"]=InfoCommand(self)
 
-        self.cmdNameList=list(self.commands.keys())
-        self.cmdNameList.sort()
+    def getCommandNames(self):
+        cmdNameList=list(COMMAND_MODULES.keys())+list(getPluginCommandModules().keys())
+        cmdNameList.sort()
+        return cmdNameList
+
+    #returns command object or None if command does not exist
+    def getCommand(self,cmdName):
+        commandObject=self.commands.get(cmdName)
+        if commandObject == None:
+            modulePath=getCommandModule(cmdName)
+            if modulePath == None:
+                return None
+            (moduleName,className)=modulePath.split(":")
+            module=importlib.import_module(moduleName,__package__)
+            commandObject=getattr(module,className)(self)
+            self.commands[cmdName]=commandObject
+        return commandObject
+
+    #returns tuple (usage, description) of command
+    def getCommandMetadata(self,cmdName):
+        metadata=COMMAND_METADATA.get(cmdName)
+        if metadata == None:
+            cmdObj=self.getCommand(cmdName)
+            cmdObj.parseCommandArgs([cmdName,"-HELP"])
+            (usage,desc)=cmdObj.executeCommand()
+            metadata=(usage.replace(cmdName,"").strip(),desc)
+            COMMAND_METADATA[cmdName]=metadata
+        return metadata
 
     def execute(self,userInput):
 
@@ -90,20 +140,22 @@ class CommandHandler:
         #cmdName is the first in input list
         cmdName=userInputList[0]
         returnValue=None
-        try:
-            commandObject=self.commands[cmdName]
-        except KeyError:
+        commandObject=self.getCommand(cmdName)
+        if commandObject == None:
             print("%s is unrecognized command."% cmdName)
         else:
             try:
                 #open inmemory sqlite database to be used in the commands
+                #database and decrypted accounts are kept for the session
                 openDatabase()
                 #execute
                 commandObject.parseCommandArgs(userInputList)
                 returnValue=commandObject.executeCommand()
-            finally:
-                #close database always
+            except:
+                #database may not be in sync with password file
+                #close it so that accounts are reloaded
                 closeDatabase()
+                raise
         
         #returnValues is used in help-command
         return returnValue
@@ -47,6 +47,7 @@ class CopyCommand(SuperCommand):
         group.add_argument('-p','--password',action='store_true', help='Copy password to clipboard.')
         group.add_argument('-U','--url',action='store_true', help='Copy URL to clipboard.')
         group.add_argument('-c','--comment',action='store_true', help='Copy comment to clipboard.')
+        cmd_parser.add_argument('--clear',metavar='SECS', required=False, type=int, help='Clear clipboard after given seconds. Default is clipboard_clear_seconds setting.')
 
         cmd_parser.add_argument('account', metavar='NAME', type=str, nargs=1,
                     help='Account name.')
@@ -84,5 +85,5 @@ class CopyCommand(SuperCommand):
             if f=="":
                 print("%s: %s is empty." % (name,fieldName))
             else:
-                copyToClipboard(f,infoMessage="%s: %s copied to clipboard." % (name,fieldName),account=name,clipboardContent=fieldName)
+                copyToClipboard(f,infoMessage="%s: %s copied to clipboard." % (name,fieldName),account=name,clipboardContent=fieldName,clearAfter=self.cmd_args.clear)
 
@@ -53,6 +53,7 @@ class DecryptCommand(SuperCommand):
         else:
             key=GlobalVariables.KEY
         
-        for arg in self.cmd_args.strings:            
-            print(decryptString(key,arg))
+        tokens=[arg.encode("utf-8") for arg in self.cmd_args.strings]
+        for decryptedString in getCipher(key).decrypt_many(tokens):
+            print(decryptedString.decode("utf-8"))
 
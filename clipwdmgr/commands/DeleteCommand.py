@@ -55,11 +55,19 @@ class DeleteCommand(SuperCommand):
         rows=list(executeSelect(COLUMNS_TO_SELECT_ORDERED_FOR_DISPLAY,arg,useID=useId))
         if not rows:
             print("No accounts to delete.")
-        for row in rows:
-            printAccountRow(row)
-            if boolValue(prompt("Delete this account (yes/no)? ")):
-                sql="delete from accounts where %s=?" % (COLUMN_CREATED)
-                executeDelete(sql,(row[COLUMN_CREATED],))
-                saveAccounts()
-                print("Account deleted.")
+        deletedAccounts=[]
+        try:
+            for row in rows:
+                printAccountRow(row)
+                if boolValue(prompt("Delete this account (yes/no)? ")):
+                    executeDelete(deleteSql(COLUMN_CREATED),(row[COLUMN_CREATED],))
+                    deletedAccounts.append(row[COLUMN_CREATED])
+        finally:
+            #password file is written once, also if user stops answering with ctrl-c
+            if deletedAccounts:
+                saveAccountChanges(deleted=deletedAccounts)
+                if len(deletedAccounts)==1:
+                    print("Account deleted.")
+                else:
+                    print("%d accounts deleted." % len(deletedAccounts))
 
@@ -89,31 +89,23 @@ class EditCommand(SuperCommand):
                 id=row[COLUMN_ID]
                 #if ID is 0, generate new ID
                 if int(id) == 0:
-                    id=generateNewID()
+                    try:
+                        id=generateNewID()
+                    except AccountIdsExhaustedError as e:
+                        printError("%s Increase %s setting." % (e,SETTING_MAX_ID))
+                        return
                 values.append(id)
 
                 created=row[COLUMN_CREATED]
                 values.append(created)
 
-                sql="update accounts set %s=?,%s=?,%s=?,%s=?,%s=?,%s=?,%s=?,%s=? where %s=?" % (
-                    COLUMN_NAME,
-                    COLUMN_URL,
-                    COLUMN_USERNAME,
-                    COLUMN_EMAIL,
-                    COLUMN_PASSWORD,
-                    COLUMN_COMMENT,
-                    COLUMN_UPDATED,
-                    COLUMN_ID,
-                    COLUMN_CREATED
-                    )
+                sql=updateSql((COLUMN_NAME,COLUMN_URL,COLUMN_USERNAME,COLUMN_EMAIL,COLUMN_PASSWORD,COLUMN_COMMENT,COLUMN_UPDATED,COLUMN_ID),COLUMN_CREATED)
                 executeSql(sql,tuple(values),commit=True)
-                saveAccounts()
+                saveAccountChanges(updated=[created])
                 print("Account updated.")
 
                 #copy edited account password to clipboard
-                where="where id = %s" % id
-                arg=name
-                _newrows=rows=executeSelect(COLUMNS_TO_SELECT_ORDERED_FOR_DISPLAY,arg,whereClause=where)
+                _newrows=executeQuery(Query(COLUMNS_TO_SELECT_ORDERED_FOR_DISPLAY).equals(COLUMN_ID,id))
                 for row in _newrows:
                     setAccountFieldsToClipboard(row)
 
@@ -50,16 +50,17 @@ class EncryptCommand(SuperCommand):
 
     def execute(self):
 
+        loadAccounts(GlobalVariables.KEY)
+        key=GlobalVariables.KEY
+        if self.cmd_args.passphrase != None:
+            key=createKey(self.cmd_args.passphrase)
+
         for arg in self.cmd_args.accounts:
-            loadAccounts(GlobalVariables.KEY)
-            rows=executeSelect(DATABASE_ACCOUNTS_TABLE_COLUMNS,arg)
-            key=GlobalVariables.KEY
-            if self.cmd_args.passphrase != None:
-                key=createKey(self.cmd_args.passphrase)
-            
-            for row in rows:
+            rows=list(executeSelect(DATABASE_ACCOUNTS_TABLE_COLUMNS,arg))
+            encryptedStrings=encryptAccountRows(rows,key)
+
+            for (row,encryptedString) in zip(rows,encryptedStrings):
                 name=row[COLUMN_NAME]
-                encryptedString=encryptAccountRow(row,key)
                 print("%s: %s" % (name,encryptedString))
                 if self.cmd_args.nocopy==False:
                     copyToClipboard(encryptedString,infoMessage="Encrypted account copied to clipboard.",account=name,clipboardContent="encrypted text")
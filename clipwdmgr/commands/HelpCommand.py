@@ -61,11 +61,8 @@ class HelpCommand(SuperCommand):
         maxLenArgs=0
         maxLenDesc=0
         commandList=[]
-        for cmdName in self.cmd_handler.cmdNameList:
-            cmdObj=self.cmd_handler.commands[cmdName]
-            cmdObj.parseCommandArgs([cmdName,"-HELP"])
-            (args,desc)=cmdObj.executeCommand()
-            args=args.replace(cmdName,"").strip()
+        for cmdName in self.cmd_handler.getCommandNames():
+            (args,desc)=self.cmd_handler.getCommandMetadata(cmdName)
             if len(cmdName)>maxLenName:
                 maxLenName=len(cmdName)
             if len(args)>maxLenArgs:
@@ -59,6 +59,21 @@ class InfoCommand(SuperCommand):
         print(formatString.format("Total accounts",str(totalAccounts)))
         lastUpdated=selectFirst("select updated from accounts order by updated desc")
         print(formatString.format("Last updated",lastUpdated))
+        print(formatString.format("Journal entries",str(getJournalEntries())))
+        header=readVaultHeader(GlobalVariables.CLI_PASSWORD_FILE)
+        kdf=None
+        if header is not None:
+            kdf=header.get("kdf")
+        if kdf is None:
+            print(formatString.format("Key derivation","none"))
+        else:
+            print(formatString.format("Key derivation",", ".join(["%s=%s" % (name,kdf[name]) for name in sorted(kdf.keys()) if name!="salt"])))
+        print(formatString.format("Cipher",getHeaderCipher(header)))
+        (records,compressedRecords,recordsSize,uncompressedSize)=getCompressionStats()
+        compressionRatio=1.0
+        if recordsSize>0:
+            compressionRatio=uncompressedSize/recordsSize
+        print(formatString.format("Compression","%s, %d of %d records compressed, ratio %.2f" % (Settings().get(SETTING_COMPRESSION),compressedRecords,records,compressionRatio)))
 
         print(formatString.format("Settings file",Settings().getSettingsFile()))
         print("Settings:")
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+#The MIT License (MIT)
+#
+#Copyright (c) 2015,2018 Sami Salkosuo
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#THE SOFTWARE.
+#
+#kdf-calibrate-command
+#
+#choose key derivation parameters that take given time on this computer
+#
+
+from ..crypto.crypto import *
+from ..utils.utils import *
+from ..utils.functions import *
+from ..database.database import *
+from .SuperCommand import *
+from ..globals import *
+from ..globals import GlobalVariables
+from ..utils.settings import Settings
+
+class KdfCalibrateCommand(SuperCommand):
+
+    def __init__(self,cmd_handler):
+        super().__init__(cmd_handler)
+    
+    
+    def parseCommandArgs(self,userInputList):
+        cmd_parser = ThrowingArgumentParser(prog="kdf-calibrate",description='Measure key derivation on this computer and use parameters that take given time to unlock password file.')
+        cmd_parser.add_argument('-t','--time', metavar='MS', type=int, default=250, help='Target unlock time in milliseconds. Default is 250.')
+        cmd_parser.add_argument('-k','--kdf', choices=[KDF_SCRYPT,KDF_PBKDF2], help='Key derivation function. Default is kdf setting.')
+        cmd_parser.add_argument('-n','--dry-run', required=False, action='store_true', help='Measure only, do not change settings or password file.')
+
+        (self.cmd_args,self.help_text)=parseCommandArgs(cmd_parser,userInputList)
+
+    def execute(self):
+        name=self.cmd_args.kdf
+        if name==None:
+            name=Settings().get(SETTING_KDF)
+        if name not in [KDF_SCRYPT,KDF_PBKDF2]:
+            print("Unknown key derivation function: %s." % name)
+            return
+
+        (cost,seconds)=calibrateKdf(name,self.cmd_args.time/1000.0)
+        if name==KDF_SCRYPT:
+            costSetting=SETTING_KDF_SCRYPT_N
+            print("scrypt n=%d r=%d p=%d: %.0f ms" % (cost,KDF_SCRYPT_R,KDF_SCRYPT_P,seconds*1000))
+        else:
+            costSetting=SETTING_KDF_PBKDF2_ITERATIONS
+            print("PBKDF2-SHA256 iterations=%d: %.0f ms" % (cost,seconds*1000))
+        if self.cmd_args.dry_run:
+            return
+
+        Settings().set(SETTING_KDF,name)
+        Settings().set(costSetting,cost)
+        if loadAccounts(GlobalVariables.KEY)==False:
+            return
+        rewriteVaultHeader(GlobalVariables.KEY)
+        print("Password file key derivation changed.")
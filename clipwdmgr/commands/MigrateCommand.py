@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+#The MIT License (MIT)
+#
+#Copyright (c) 2015,2018 Sami Salkosuo
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#THE SOFTWARE.
+#
+#migrate-command
+#
+#encrypt all accounts using new data key and cipher
+#
+
+from ..crypto.crypto import *
+from ..utils.utils import *
+from ..utils.functions import *
+from ..database.database import *
+from .SuperCommand import *
+from ..globals import *
+from ..globals import GlobalVariables
+from ..utils.settings import Settings
+
+class MigrateCommand(SuperCommand):
+
+    def __init__(self,cmd_handler):
+        super().__init__(cmd_handler)
+    
+    
+    def parseCommandArgs(self,userInputList):
+        cmd_parser = ThrowingArgumentParser(prog="migrate",description='Encrypt all accounts using new data key and given cipher.')
+        cmd_parser.add_argument('-c','--cipher', choices=[CIPHER_AES_GCM,CIPHER_CHACHA20_POLY1305,CIPHER_FERNET], help='Cipher of accounts. Default is cipher setting.')
+
+        (self.cmd_args,self.help_text)=parseCommandArgs(cmd_parser,userInputList)
+
+    def execute(self):
+        cipher=self.cmd_args.cipher
+        if cipher==None:
+            cipher=getNewVaultCipher()
+
+        if loadAccounts(GlobalVariables.KEY)==False:
+            return
+        oldSize=os.path.getsize(GlobalVariables.CLI_PASSWORD_FILE)
+        oldCipher=getHeaderCipher(readVaultHeader(GlobalVariables.CLI_PASSWORD_FILE))
+        migrateAccounts(cipher)
+        newSize=os.path.getsize(GlobalVariables.CLI_PASSWORD_FILE)
+        totalAccounts=selectFirst("select count(*) from accounts")
+        print("%d accounts migrated from %s to %s." % (totalAccounts,oldCipher,cipher))
+        print("Password file size: %s -> %s" % (sizeof_fmt(oldSize),sizeof_fmt(newSize)))
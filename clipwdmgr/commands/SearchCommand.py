@@ -40,32 +40,41 @@ class SearchCommand(SuperCommand):
     
     def parseCommandArgs(self,userInputList):
         cmd_parser = ThrowingArgumentParser(prog="search",description='Search accounts that match given string.')
-        group = cmd_parser.add_mutually_exclusive_group(required=True)
+        group = cmd_parser.add_mutually_exclusive_group()
         group.add_argument('-u','--username',metavar='UNAME', type=str, help='Search by username.')
         group.add_argument('-e','--email',metavar='EMAIL', type=str, help='Search by email.')
-        group.add_argument('searchstring', metavar='STRING', type=str, nargs='?',
-                    help='Search string in name, url or comment.')
+        cmd_parser.add_argument('-s','--substring', required=False, action='store_true', help='Match search strings anywhere in words.')
+        cmd_parser.add_argument('searchstring', metavar='STRING', type=str, nargs='*',
+                    help='Search words in name, url or comment. Quoted string is a phrase. Prefix name:, url: or comment: searches only that field.')
 
         (self.cmd_args,self.help_text)=parseCommandArgs(cmd_parser,userInputList)
 
     def execute(self):
 
+        columns=[COLUMN_URL,COLUMN_ID,COLUMN_CREATED,COLUMN_UPDATED,COLUMN_NAME,COLUMN_USERNAME,COLUMN_EMAIL,COLUMN_PASSWORD,COLUMN_COMMENT]
+        searchTerms=self.cmd_args.searchstring
+        if len(parseSearchTerms(searchTerms))==0:
+            #terms like 'url:' are empty
+            searchTerms=[]
+        if self.cmd_args.username is None and self.cmd_args.email is None and len(searchTerms)==0:
+            print("Search string, username or email required.")
+            return
+        if len(searchTerms)>0 and (self.cmd_args.username is not None or self.cmd_args.email is not None):
+            print("Search string not allowed with username or email.")
+            return
+
         loadAccounts(GlobalVariables.KEY)
-        where=""
 
         arg=self.cmd_args.username
         if arg is not None:
-            where="where %s like '%%%s%%' " % (COLUMN_USERNAME,arg)
+            rows=executeQuery(Query(columns).contains(COLUMN_USERNAME,arg))
 
         arg=self.cmd_args.email
         if arg is not None:
-            where="where %s like '%%%s%%' " % (COLUMN_EMAIL,arg)
-
-        arg=self.cmd_args.searchstring
-        if arg is not None:
-            where="where %s like '%%%s%%' or %s like '%%%s%%' or %s like '%%%s%%' " % (COLUMN_NAME,arg,COLUMN_COMMENT,arg,COLUMN_URL,arg)
+            rows=executeQuery(Query(columns).contains(COLUMN_EMAIL,arg))
 
+        if len(searchTerms)>0:
+            #full-text search when available, ranked by relevance
+            rows=searchAccounts(columns,searchTerms,useFullText=not self.cmd_args.substring)
 
-        rows=executeSelect([COLUMN_URL,COLUMN_ID,COLUMN_CREATED,COLUMN_UPDATED,COLUMN_NAME,COLUMN_USERNAME,COLUMN_EMAIL,COLUMN_PASSWORD,COLUMN_COMMENT],whereClause=where)
         printAccountRows(rows)
-
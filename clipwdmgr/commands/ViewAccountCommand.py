@@ -61,21 +61,22 @@ class ViewAccountCommand(SuperCommand):
             #no accounts, so return
             return
 
+        query=Query(COLUMNS_TO_SELECT_ORDERED_FOR_DISPLAY)
         arg=self.cmd_args.account[0]
         if self.cmd_args.id:
-            where="where id = %s" % arg
+            query.equals(COLUMN_ID,arg)
         else:
-            where="where name like \"%s%%\"" % arg
+            query.startsWith(COLUMN_NAME,arg)
 
         arg=self.cmd_args.username
         if arg:
-            where=where+" and username like '%%%s%%'" % (arg)
+            query.contains(COLUMN_USERNAME,arg)
 
         arg=self.cmd_args.comment
         if arg:
-            where=where+" and comment like '%%%s%%'" % (arg)
+            query.contains(COLUMN_COMMENT,arg)
 
-        rows=executeSelect(COLUMNS_TO_SELECT_ORDERED_FOR_DISPLAY,arg,whereClause=where)
+        rows=executeQuery(query)
         for row in rows:
             if self.cmd_args.encrypt==True:
                 encryptedAccount=encryptAccountRow(row)
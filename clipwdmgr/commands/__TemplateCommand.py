@@ -23,6 +23,7 @@
 #THE SOFTWARE.
 #
 #template for commands - copy this to new file and rename and change this description
+#and add command name and module:class to COMMAND_MODULES in CommandHandler.py
 #
 
 from ..utils.utils import *
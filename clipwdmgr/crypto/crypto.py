@@ -22,12 +22,23 @@
 
 #encryption/decryption related functions
 from cryptography.fernet import Fernet,InvalidToken
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM,ChaCha20Poly1305
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 import hashlib
 import base64
-from prompt_toolkit import prompt
+import json
+import os
+import time
+
+from ..globals import *
 
 def askPassphrase(str):
-    
+    #prompt_toolkit is imported only when passphrase is asked
+    from prompt_toolkit import prompt
     passphrase=prompt(str, is_password=True)
     if passphrase=="":
         return None
@@ -37,20 +48,220 @@ def askPassphrase(str):
     return key
 
 def createKey(str):
+    #passphrase key, input of key derivation function of password file
     key=hashlib.sha256(str.encode('utf-8')).digest()
     key=base64.urlsafe_b64encode(key)
     return key
 
+#key derivation makes guessing passphrase slow
+#parameters and salt are in password file header, derived keys are cached for the session
+
+#derived keys by (passphrase key, key derivation parameters)
+DERIVED_KEYS={}
+
+def createKdfParameters(name,cost):
+    #cost is scrypt n or PBKDF2 iterations, new random salt
+    salt=base64.b64encode(os.urandom(16)).decode("utf-8")
+    if name==KDF_SCRYPT:
+        return {"name":name,"salt":salt,"n":int(cost),"r":KDF_SCRYPT_R,"p":KDF_SCRYPT_P}
+    if name==KDF_PBKDF2:
+        return {"name":name,"salt":salt,"iterations":int(cost)}
+    raise ValueError("Unknown key derivation function: %s." % name)
+
+def getKdfCost(kdf):
+    if kdf["name"]==KDF_SCRYPT:
+        return kdf["n"]
+    return kdf["iterations"]
+
+def runKdf(key,kdf):
+    salt=base64.b64decode(kdf["salt"])
+    if kdf["name"]==KDF_SCRYPT:
+        function=Scrypt(salt=salt,length=32,n=kdf["n"],r=kdf["r"],p=kdf["p"])
+    elif kdf["name"]==KDF_PBKDF2:
+        function=PBKDF2HMAC(algorithm=hashes.SHA256(),length=32,salt=salt,iterations=kdf["iterations"])
+    else:
+        raise ValueError("Unknown key derivation function: %s." % kdf["name"])
+    return base64.urlsafe_b64encode(function.derive(key))
+
+def deriveKey(key,kdf):
+    #return key derived from passphrase key, passphrase key if kdf is None
+    if kdf is None:
+        return key
+    cacheKey=(key,json.dumps(kdf,sort_keys=True))
+    if cacheKey not in DERIVED_KEYS:
+        DERIVED_KEYS[cacheKey]=runKdf(key,kdf)
+    return DERIVED_KEYS[cacheKey]
+
+def measureKdf(name,cost):
+    #seconds to derive one key
+    startTime=time.perf_counter()
+    runKdf(createKey("calibrate"),createKdfParameters(name,cost))
+    return time.perf_counter()-startTime
+
+def calibrateKdf(name,targetSeconds):
+    #return tuple (cost, seconds) of key derivation that takes about targetSeconds
+    #first derivation is slower, it is not measured
+    measureKdf(name,KDF_SCRYPT_MIN_N if name==KDF_SCRYPT else KDF_PBKDF2_MIN_ITERATIONS)
+    if name==KDF_SCRYPT:
+        #n is power of two, choose n that is nearest to target
+        n=KDF_SCRYPT_MIN_N
+        seconds=measureKdf(name,n)
+        while n<KDF_SCRYPT_MAX_N and abs(seconds*2-targetSeconds)<abs(seconds-targetSeconds):
+            n=n*2
+            seconds=measureKdf(name,n)
+        return (n,seconds)
+    #PBKDF2 time is linear to iterations
+    iterations=KDF_PBKDF2_MIN_ITERATIONS
+    seconds=measureKdf(name,iterations)
+    iterations=max(int(iterations*targetSeconds/seconds)//1000*1000,KDF_PBKDF2_MIN_ITERATIONS)
+    return (iterations,measureKdf(name,iterations))
+
+#encrypted account records
+#fernet: Fernet token
+#aes-256-gcm and chacha20-poly1305: base64 (without padding) of format byte, nonce and
+#ciphertext with tag, format byte is authenticated, AEAD key is derived from data key
+#decryption detects format of each record, so password file can have records of many formats
+
+#format byte of AEAD records
+RECORD_FORMATS={
+    CIPHER_AES_GCM:1,
+    CIPHER_CHACHA20_POLY1305:2,
+}
+RECORD_AEAD_CLASSES={
+    1:AESGCM,
+    2:ChaCha20Poly1305,
+}
+RECORD_NONCE_LENGTH=12
+#Fernet tokens start with version byte 0x80 and timestamp
+FERNET_TOKEN_PREFIX=b"gAAAAA"
+
+class VaultCipher:
+    #encrypts using one key and cipher, decrypts records of all formats
+    #cipher instances are created once, batch methods work on bytes
+
+    def __init__(self,key,cipher=CIPHER_FERNET):
+        if cipher!=CIPHER_FERNET and cipher not in RECORD_FORMATS:
+            raise ValueError("Unknown cipher: %s." % cipher)
+        self.key=key
+        self.cipher=cipher
+        self.fernet=Fernet(key)
+        #AEAD instances by format byte
+        self.aeads={}
+
+    def getAead(self,recordFormat):
+        if recordFormat not in self.aeads:
+            #separate key for each format
+            hkdf=HKDF(algorithm=hashes.SHA256(),length=32,salt=None,info=b"clipwdmgr record %d" % recordFormat)
+            self.aeads[recordFormat]=RECORD_AEAD_CLASSES[recordFormat](hkdf.derive(base64.urlsafe_b64decode(self.key)))
+        return self.aeads[recordFormat]
+
+    def encrypt(self,data):
+        if self.cipher==CIPHER_FERNET:
+            return self.fernet.encrypt(data)
+        recordFormat=bytes([RECORD_FORMATS[self.cipher]])
+        nonce=os.urandom(RECORD_NONCE_LENGTH)
+        record=recordFormat+nonce+self.getAead(recordFormat[0]).encrypt(nonce,data,recordFormat)
+        return base64.urlsafe_b64encode(record).rstrip(b"=")
+
+    def decrypt(self,token):
+        #raises InvalidToken if token is not valid, also for AEAD records
+        if token.startswith(FERNET_TOKEN_PREFIX):
+            return self.fernet.decrypt(token)
+        try:
+            record=base64.urlsafe_b64decode(token+b"="*(-len(token)%4))
+            aead=self.getAead(record[0])
+            return aead.decrypt(record[1:1+RECORD_NONCE_LENGTH],record[1+RECORD_NONCE_LENGTH:],record[:1])
+        except (InvalidTag,ValueError,KeyError,IndexError):
+            raise InvalidToken
+
+    def encrypt_many(self,dataList):
+        encrypt=self.encrypt
+        return [encrypt(data) for data in dataList]
+
+    def decrypt_many(self,tokens):
+        decrypt=self.decrypt
+        return [decrypt(token) for token in tokens]
+
+#ciphers by (key, cipher)
+CIPHERS={}
+
+def getCipher(key,cipher=CIPHER_FERNET):
+    #return VaultCipher of key, cipher is created only once
+    if (key,cipher) not in CIPHERS:
+        CIPHERS[(key,cipher)]=VaultCipher(key,cipher)
+    return CIPHERS[(key,cipher)]
+
 def encryptString(key,str):
     if str==None or str=="":
         return
-    fernet = Fernet(key)
-    encryptedString = fernet.encrypt(str.encode("utf-8"))
+    encryptedString = getCipher(key).encrypt(str.encode("utf-8"))
     return encryptedString.decode("utf-8")
 
 def decryptString(key,str):
     if str==None or str=="":
         return
-    fernet = Fernet(key)
-    decryptedString = fernet.decrypt(str.encode("utf-8"))
+    decryptedString = getCipher(key).decrypt(str.encode("utf-8"))
     return decryptedString.decode("utf-8")
+
+#password file accounts are encrypted using random data key
+#data key is stored in password file header, encrypted (wrapped) using passphrase key
+
+#unwrapped data keys by (passphrase key, wrapped key)
+DATA_KEYS={}
+
+def createDataKey():
+    return Fernet.generate_key()
+
+def wrapDataKey(key,dataKey):
+    return getCipher(key).encrypt(dataKey).decode("utf-8")
+
+def unwrapDataKey(key,wrappedKey):
+    #raises InvalidToken if passphrase is wrong
+    if (key,wrappedKey) not in DATA_KEYS:
+        DATA_KEYS[(key,wrappedKey)]=Fernet(key).decrypt(wrappedKey.encode("utf-8"))
+    return DATA_KEYS[(key,wrappedKey)]
+
+def makeVaultHeader(encryptionKey,dataKey,kdf,cipher):
+    #header line of password file
+    header={"version":VAULT_HEADER_VERSION,"kdf":kdf,"cipher":cipher,"key":wrapDataKey(deriveKey(encryptionKey,kdf),dataKey)}
+    return VAULT_HEADER_PREFIX+json.dumps(header,sort_keys=True)
+
+def splitVaultHeader(content):
+    #return tuple (header dictionary or None, rest of content) of password file content (bytes)
+    prefix=VAULT_HEADER_PREFIX.encode("utf-8")
+    if not content.startswith(prefix):
+        return (None,content)
+    end=content.find(b"\n")
+    if end<0:
+        end=len(content)
+    header=json.loads(content[len(prefix):end].decode("utf-8"))
+    if header.get("version",0)>VAULT_HEADER_VERSION:
+        raise ValueError("Password file version %s is not supported." % header.get("version"))
+    return (header,content[end:])
+
+def readVaultHeader(filename):
+    #return header of password file or None if file does not have header
+    try:
+        with open(filename,"rb") as file:
+            return splitVaultHeader(file.readline())[0]
+    except OSError:
+        return None
+
+def getHeaderDataKey(encryptionKey,header):
+    #return data key of header, passphrase key if password file does not have header
+    #raises InvalidToken if passphrase is wrong
+    if header is None:
+        return encryptionKey
+    #headers of version 1 do not have key derivation
+    return unwrapDataKey(deriveKey(encryptionKey,header.get("kdf")),header["key"])
+
+def getHeaderCipher(header):
+    #cipher of new accounts in password file, headers of version 2 and files without header use Fernet
+    if header is None:
+        return CIPHER_FERNET
+    return header.get("cipher",CIPHER_FERNET)
+
+def decryptTokens(key,tokens):
+    #decrypt list of tokens (bytes) and return list of bytes
+    #used also by worker processes when loading accounts
+    return getCipher(key).decrypt_many(tokens)
@@ -23,24 +23,68 @@
 #database functions
 import sqlite3
 import os
+import time
 from random import randint
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 from ..crypto.crypto import *
 from ..utils.utils import *
 from ..globals import *
 from ..globals import GlobalVariables
 from ..utils.settings import Settings
+from .query import *
+from .records import *
+from ..utils.backups import createBackup
 
 #sqlite database
 DATABASE=None
 #sqlite database cursor
 DATABASE_CURSOR=None
 
+#session vault: accounts are decrypted once and kept in the in-memory database
+#VAULT_SIGNATURE identifies the password file contents that were loaded
+#(file name, inode, modification time and size), VAULT_TAIL holds the last bytes
+#that were loaded and VAULT_KEY the passphrase key used to load them
+#VAULT_DATA_KEY is the key of accounts in the loaded password file
+VAULT_SIGNATURE=None
+VAULT_TAIL=None
+VAULT_KEY=None
+VAULT_DATA_KEY=None
+#True if sqlite supports FTS5 full-text search, set when database is opened
+FTS5_AVAILABLE=False
+#True if trigram index is enabled and supported by sqlite, set when database is opened
+TRIGRAM_AVAILABLE=False
+
+#length of VAULT_TAIL, used to verify that password file was appended and not rewritten
+VAULT_TAIL_LENGTH=256
+
+#accounts_ciphertext table has encrypted password file line of each account
+#that has not changed after loading, rowid is the rowid in accounts table
+#lines are encrypted using VAULT_DATA_KEY and they are reused when saving accounts
+#size and uncompressed_size are plaintext bytes of the record, they are equal if record is not compressed
+CIPHERTEXT_TABLE="accounts_ciphertext"
+
+#number of journal entries in loaded password file
+JOURNAL_ENTRIES=0
+
+#(records, compressed records, size of records, size of uncompressed records)
+#of password file, sizes are plaintext bytes before encryption
+#updated when records are loaded, appended and saved
+COMPRESSION_STATS=(0,0,0,0)
+
+#encrypted lines of loaded password file that could not be decrypted using VAULT_DATA_KEY
+#they are skipped when loading and kept in password file when it is saved
+DAMAGED_RECORDS=[]
+
 #class Database():
 def openDatabase():
     global DATABASE
     global DATABASE_CURSOR
-    DATABASE=sqlite3.connect(':memory:')
+    if DATABASE is not None:
+        #database is kept open for the whole session
+        return
+    DATABASE=sqlite3.connect(':memory:',cached_statements=QUERY_CACHE_SIZE)
     DATABASE.row_factory = sqlite3.Row
     DATABASE_CURSOR=DATABASE.cursor()
     sql=[]
@@ -66,6 +110,136 @@ def openDatabase():
     sql="".join(sql)
     debug("Create SQL: %s " %sql)
     DATABASE_CURSOR.execute(sql)
+    DATABASE_CURSOR.execute("CREATE TABLE %s (rowid INTEGER PRIMARY KEY, token TEXT, size INTEGER, uncompressed_size INTEGER)" % CIPHERTEXT_TABLE)
+    createFullTextTable()
+    createIndexes()
+
+def createFullTextTable():
+    #full-text and trigram indexes of accounts table, not available in all sqlite builds
+    global FTS5_AVAILABLE
+    global TRIGRAM_AVAILABLE
+    sql="CREATE VIRTUAL TABLE accounts_fts USING fts5(%s, content='accounts', content_rowid='rowid')" % ",".join(DATABASE_ACCOUNTS_FTS_COLUMNS)
+    try:
+        DATABASE_CURSOR.execute(sql)
+        FTS5_AVAILABLE=True
+    except sqlite3.OperationalError as e:
+        debug("FTS5 not available: %s" % e)
+        FTS5_AVAILABLE=False
+    TRIGRAM_AVAILABLE=False
+    if FTS5_AVAILABLE and Settings().getBoolean(SETTING_TRIGRAM_INDEX):
+        sql="CREATE VIRTUAL TABLE accounts_trigram USING fts5(%s, content='accounts', content_rowid='rowid', tokenize='trigram')" % ",".join(DATABASE_ACCOUNTS_TRIGRAM_COLUMNS)
+        try:
+            DATABASE_CURSOR.execute(sql)
+            TRIGRAM_AVAILABLE=True
+        except sqlite3.OperationalError as e:
+            #trigram tokenizer requires sqlite 3.34
+            debug("Trigram index not available: %s" % e)
+
+def getFullTextTables():
+    #return list of (table,columns) of full-text indexes in use
+    tables=[]
+    if FTS5_AVAILABLE:
+        tables.append(("accounts_fts",DATABASE_ACCOUNTS_FTS_COLUMNS))
+    if TRIGRAM_AVAILABLE:
+        tables.append(("accounts_trigram",DATABASE_ACCOUNTS_TRIGRAM_COLUMNS))
+    return tables
+
+def createIndex(indexName,column,collation):
+    sql="CREATE INDEX IF NOT EXISTS %s ON accounts (%s" % (indexName,column)
+    if collation is not None:
+        sql="%s COLLATE %s" % (sql,collation)
+    sql="%s)" % sql
+    debug("Create index SQL: %s " %sql)
+    DATABASE_CURSOR.execute(sql)
+
+def createIndexes():
+    for (indexName,column,collation) in DATABASE_ACCOUNTS_TABLE_INDEXES:
+        createIndex(indexName,column,collation)
+    for (table,columnList) in getFullTextTables():
+        #triggers keep full-text index in sync with accounts table
+        columns=",".join(columnList)
+        newValues=",".join(["new.%s" % column for column in columnList])
+        oldValues=",".join(["old.%s" % column for column in columnList])
+        insertSql="INSERT INTO %s(rowid,%s) VALUES (new.rowid,%s);" % (table,columns,newValues)
+        deleteSql="INSERT INTO %s(%s,rowid,%s) VALUES ('delete',old.rowid,%s);" % (table,table,columns,oldValues)
+        DATABASE_CURSOR.execute("CREATE TRIGGER IF NOT EXISTS %s_insert AFTER INSERT ON accounts BEGIN %s END" % (table,insertSql))
+        DATABASE_CURSOR.execute("CREATE TRIGGER IF NOT EXISTS %s_delete AFTER DELETE ON accounts BEGIN %s END" % (table,deleteSql))
+        DATABASE_CURSOR.execute("CREATE TRIGGER IF NOT EXISTS %s_update AFTER UPDATE ON accounts BEGIN %s %s END" % (table,deleteSql,insertSql))
+        #index accounts inserted while triggers did not exist
+        DATABASE_CURSOR.execute("INSERT INTO %s(%s) VALUES ('rebuild')" % (table,table))
+    #changed and deleted accounts are encrypted again when saved
+    deleteSql="DELETE FROM %s WHERE rowid=old.rowid;" % CIPHERTEXT_TABLE
+    DATABASE_CURSOR.execute("CREATE TRIGGER IF NOT EXISTS %s_delete AFTER DELETE ON accounts BEGIN %s END" % (CIPHERTEXT_TABLE,deleteSql))
+    DATABASE_CURSOR.execute("CREATE TRIGGER IF NOT EXISTS %s_update AFTER UPDATE ON accounts BEGIN %s END" % (CIPHERTEXT_TABLE,deleteSql))
+    DATABASE.commit()
+
+def dropIndexes():
+    for (indexName,column,collation) in DATABASE_ACCOUNTS_TABLE_INDEXES:
+        DATABASE_CURSOR.execute("DROP INDEX IF EXISTS %s" % indexName)
+    for (table,columnList) in getFullTextTables():
+        for trigger in ["insert","delete","update"]:
+            DATABASE_CURSOR.execute("DROP TRIGGER IF EXISTS %s_%s" % (table,trigger))
+    for trigger in ["delete","update"]:
+        DATABASE_CURSOR.execute("DROP TRIGGER IF EXISTS %s_%s" % (CIPHERTEXT_TABLE,trigger))
+
+def analyzeDatabase():
+    #update query planner statistics after loading accounts
+    #analysis_limit keeps ANALYZE fast for large number of accounts
+    DATABASE_CURSOR.execute("PRAGMA analysis_limit=1000")
+    DATABASE_CURSOR.execute("ANALYZE")
+
+def parseSearchTerms(searchTerms):
+    #return list of (column,value) tuples from search terms
+    #term 'url:example' searches only given column, column is None for all columns
+    terms=[]
+    for term in searchTerms:
+        column=None
+        ind=term.find(":")
+        if ind>0 and term[:ind].upper() in DATABASE_ACCOUNTS_FTS_COLUMNS:
+            column=term[:ind].upper()
+            term=term[ind+1:]
+        if term.strip()!="":
+            terms.append((column,term))
+    return terms
+
+def toFullTextQuery(searchTerms):
+    #return FTS5 query of search terms
+    #every term is a quoted prefix query, term with spaces is phrase query
+    query=[]
+    for (column,value) in parseSearchTerms(searchTerms):
+        value='"%s"*' % value.replace('"','""')
+        if column is not None:
+            value="%s : %s" % (column,value)
+        query.append(value)
+    return " AND ".join(query)
+
+def searchAccounts(listOfColumnNames,searchTerms,useFullText=True):
+    #return accounts that match all search terms
+    #uses full-text index ordered by relevance if available
+    #otherwise substring search ordered by name
+    terms=parseSearchTerms(searchTerms)
+    if len(terms)==0:
+        #query without conditions would return all accounts
+        raise ValueError("No search terms.")
+    query=Query(listOfColumnNames)
+    if FTS5_AVAILABLE and useFullText:
+        query.matches("accounts_fts",toFullTextQuery(searchTerms),DATABASE_ACCOUNTS_FTS_WEIGHTS)
+    else:
+        for (column,value) in terms:
+            columns=DATABASE_ACCOUNTS_FTS_COLUMNS
+            if column is not None:
+                columns=[column]
+            query.contains(columns,value)
+    return executeQuery(query)
+
+def executeQuery(query):
+    #execute select query built using Query
+    trigramColumns=()
+    if TRIGRAM_AVAILABLE:
+        trigramColumns=tuple(DATABASE_ACCOUNTS_TRIGRAM_COLUMNS)
+    (sql,params)=query.build(trigramColumns)
+    debug("executeQuery SQL: %s" % sql)
+    return DATABASE_CURSOR.execute(sql,params)
 
 def closeDatabase():
     global DATABASE
@@ -74,27 +248,271 @@ def closeDatabase():
         DATABASE.close()
     DATABASE=None
     DATABASE_CURSOR=None
+    invalidateVault()
+    resetIdAllocator()
+
+def getVaultSignature(filename):
+    #return signature of password file or None if file does not exist
+    try:
+        stat=os.stat(filename)
+    except OSError:
+        return None
+    return (filename,stat.st_ino,stat.st_mtime_ns,stat.st_size)
+
+def isVaultLoaded(encryptionKey):
+    #True if accounts table has the current contents of the password file
+    if DATABASE is None or VAULT_SIGNATURE is None:
+        return False
+    if VAULT_KEY != encryptionKey:
+        return False
+    return VAULT_SIGNATURE == getVaultSignature(GlobalVariables.CLI_PASSWORD_FILE)
+
+def readAppendedAccounts(encryptionKey):
+    #if accounts were only appended to password file after loading
+    #return tuple (signature,new bytes), otherwise None
+    if DATABASE is None or VAULT_SIGNATURE is None:
+        return None
+    if VAULT_KEY != encryptionKey:
+        return None
+    signature=getVaultSignature(GlobalVariables.CLI_PASSWORD_FILE)
+    if signature is None:
+        return None
+    (filename,inode,mtime,size)=VAULT_SIGNATURE
+    if signature[0:2] != (filename,inode) or signature[3] <= size:
+        return None
+    #bytes before old end of file must be unchanged
+    #rewritten file has different bytes because every encryption is unique
+    #accounts that other process is appending are loaded when append is complete
+    end=signature[3]
+    appendStart=getAppendInProgress(filename)
+    if appendStart is not None:
+        end=min(max(appendStart,size),end)
+    content=readFileAsBytes(filename,size-len(VAULT_TAIL),end-size+len(VAULT_TAIL))
+    if content[:len(VAULT_TAIL)] != VAULT_TAIL:
+        return None
+    content=content[len(VAULT_TAIL):]
+    if not content.startswith(b"\n") and not VAULT_TAIL.endswith(b"\n") and size>0:
+        #last loaded line was continued
+        return None
+    #signature size is what was read, rest is loaded next time
+    signature=signature[0:3]+(size+len(content),)
+    return (signature,content)
+
+def setVaultLoaded(encryptionKey,signature=None,tail=None,dataKey=None):
+    #call after accounts table and password file are in sync
+    #dataKey is given when password file was loaded or saved using another data key
+    global VAULT_SIGNATURE
+    global VAULT_TAIL
+    global VAULT_KEY
+    global VAULT_DATA_KEY
+    if signature is None:
+        signature=getVaultSignature(GlobalVariables.CLI_PASSWORD_FILE)
+    if signature is None:
+        invalidateVault()
+        return
+    if tail is None:
+        size=signature[3]
+        tailStart=max(size-VAULT_TAIL_LENGTH,0)
+        tail=readFileAsBytes(signature[0],tailStart,size-tailStart)
+    VAULT_SIGNATURE=signature
+    VAULT_TAIL=tail[-VAULT_TAIL_LENGTH:]
+    VAULT_KEY=encryptionKey
+    if dataKey is not None:
+        VAULT_DATA_KEY=dataKey
+
+def setVaultAppended(encryptionKey,appendStart,appendEnd):
+    #call after this process appended bytes from appendStart to appendEnd to loaded password file
+    #returns False if password file was not loaded up to appendStart or if other
+    #process has appended after it, appended bytes are then read using loadAccounts
+    if VAULT_SIGNATURE is None or VAULT_KEY != encryptionKey or VAULT_SIGNATURE[3] != appendStart:
+        return False
+    signature=getVaultSignature(GlobalVariables.CLI_PASSWORD_FILE)
+    if signature is None or signature[0:2] != VAULT_SIGNATURE[0:2] or signature[3] != appendEnd:
+        return False
+    setVaultLoaded(encryptionKey,signature)
+    return True
+
+def invalidateVault():
+    #accounts are reloaded from password file when next needed
+    global VAULT_SIGNATURE
+    global VAULT_TAIL
+    global VAULT_KEY
+    global VAULT_DATA_KEY
+    VAULT_SIGNATURE=None
+    VAULT_TAIL=None
+    VAULT_KEY=None
+    VAULT_DATA_KEY=None
+
+def getVaultKdf(newSalt=False):
+    #key derivation parameters for saving password file
+    #parameters and salt of current password file are kept if they match settings
+    name=Settings().get(SETTING_KDF)
+    if name==KDF_SCRYPT:
+        cost=Settings().getInt(SETTING_KDF_SCRYPT_N)
+    elif name==KDF_PBKDF2:
+        cost=Settings().getInt(SETTING_KDF_PBKDF2_ITERATIONS)
+    else:
+        printError("Invalid %s setting: %s." % (SETTING_KDF,name))
+        name=KDF_SCRYPT
+        cost=SETTING_DEFAULT_VALUES[SETTING_KDF_SCRYPT_N]
+    header=None
+    if not newSalt:
+        header=readVaultHeader(GlobalVariables.CLI_PASSWORD_FILE)
+    if header is not None and header.get("kdf") is not None:
+        kdf=header["kdf"]
+        if kdf["name"]==name and getKdfCost(kdf)==cost:
+            return kdf
+    return createKdfParameters(name,cost)
+
+def getNewVaultCipher():
+    #cipher of new and converted password files
+    cipher=Settings().get(SETTING_CIPHER)
+    if cipher!=CIPHER_FERNET and cipher not in RECORD_FORMATS:
+        printError("Invalid %s setting: %s." % (SETTING_CIPHER,cipher))
+        return SETTING_DEFAULT_VALUES[SETTING_CIPHER]
+    return cipher
+
+def getRecordCompression():
+    #(compression method, minimum record size) of saved accounts
+    method=Settings().get(SETTING_COMPRESSION)
+    if method!=COMPRESSION_NONE and method not in RECORD_COMPRESSION_METHODS:
+        printError("Invalid %s setting: %s." % (SETTING_COMPRESSION,method))
+        method=COMPRESSION_NONE
+    return (method,Settings().getInt(SETTING_COMPRESSION_MIN_SIZE))
+
+def getDataKey(encryptionKey):
+    #return key used to encrypt accounts in password file
+    if VAULT_DATA_KEY is not None and isVaultLoaded(encryptionKey):
+        return VAULT_DATA_KEY
+    return getHeaderDataKey(encryptionKey,readVaultHeader(GlobalVariables.CLI_PASSWORD_FILE))
+
+def getRecordCipher(encryptionKey):
+    #return cipher used to encrypt new accounts and journal entries of password file
+    return getCipher(getDataKey(encryptionKey),getHeaderCipher(readVaultHeader(GlobalVariables.CLI_PASSWORD_FILE)))
+
+def clearAccounts():
+    clearDamagedRecords()
+    DATABASE_CURSOR.execute("delete from accounts")
+    DATABASE_CURSOR.execute("delete from %s" % CIPHERTEXT_TABLE)
+    DATABASE.commit()
+    resetJournalEntries()
+    resetCompressionStats()
+
+def getJournalEntries():
+    return JOURNAL_ENTRIES
+
+def addJournalEntries(count):
+    global JOURNAL_ENTRIES
+    JOURNAL_ENTRIES=JOURNAL_ENTRIES+count
 
-def executeSelect(listOfColumnNames,whereNameStartsWith=None,whereClause=None,orderBy=COLUMN_NAME,returnSQLOnly=False,useID=False):
-    where=""
+def getCompressionStats():
+    return COMPRESSION_STATS
+
+def addCompressionStats(recordSizes):
+    #count records when they are loaded or written so that info does not decrypt password file again
+    #recordSizes are (size, uncompressed size) of records
+    global COMPRESSION_STATS
+    (records,compressedRecords,size,uncompressedSize)=COMPRESSION_STATS
+    for (recordSize,uncompressedRecordSize) in recordSizes:
+        records=records+1
+        if uncompressedRecordSize>recordSize:
+            compressedRecords=compressedRecords+1
+        size=size+recordSize
+        uncompressedSize=uncompressedSize+uncompressedRecordSize
+    COMPRESSION_STATS=(records,compressedRecords,size,uncompressedSize)
+
+def resetCompressionStats():
+    global COMPRESSION_STATS
+    COMPRESSION_STATS=(0,0,0,0)
+
+def setSavedCompressionStats():
+    #saved password file has the records of accounts table, sizes of all records are in ciphertext table
+    global COMPRESSION_STATS
+    (records,compressedRecords,size,uncompressedSize)=DATABASE_CURSOR.execute("select count(*),sum(uncompressed_size>size),sum(size),sum(uncompressed_size) from %s" % CIPHERTEXT_TABLE).fetchone()
+    COMPRESSION_STATS=(records,compressedRecords or 0,size or 0,uncompressedSize or 0)
+
+def compressRecords(records):
+    #compress records using compression setting
+    #return (compressed records, (size, uncompressed size) of records)
+    compression=getRecordCompression()
+    compressedRecords=[compressRecord(record,*compression) for record in records]
+    return (compressedRecords,[(len(compressedRecord),len(record)) for (compressedRecord,record) in zip(compressedRecords,records)])
+
+def getDamagedRecords():
+    return DAMAGED_RECORDS
+
+def clearDamagedRecords():
+    global DAMAGED_RECORDS
+    DAMAGED_RECORDS=[]
+
+def resetJournalEntries():
+    global JOURNAL_ENTRIES
+    JOURNAL_ENTRIES=0
+
+def applyJournalEntry(operation,values):
+    #replace or delete accounts that have the same CREATED
+    created=values[DATABASE_ACCOUNTS_TABLE_COLUMNS.index(COLUMN_CREATED)]
+    #index may have been dropped for loading
+    for (indexName,column,collation) in DATABASE_ACCOUNTS_TABLE_INDEXES:
+        if column==COLUMN_CREATED:
+            createIndex(indexName,column,collation)
+    with DATABASE:
+        #ciphertext triggers may have been dropped for loading
+        DATABASE_CURSOR.execute("delete from %s where rowid in (select rowid from accounts where %s=?)" % (CIPHERTEXT_TABLE,COLUMN_CREATED),(created,))
+        DATABASE_CURSOR.execute("delete from accounts where %s=?" % COLUMN_CREATED,(created,))
+    if operation==JOURNAL_UPSERT:
+        insertAccountValuesToDB([values])
+    elif operation!=JOURNAL_DELETE:
+        printError("Unknown journal entry: %s." % operation)
+
+def replayAccounts(records,tokens):
+    #insert accounts and apply journal entries in password file order
+    #encrypted lines of journal entries are not kept, they are removed when compacting
+    defaults=getRecordDefaults(getInsertTimestamp())
+    #records are decompressed once, sizes are counted for info
+    uncompressedRecords=[decompressRecord(record) for record in records]
+    recordSizes=[(len(record),len(uncompressedRecord)) for (record,uncompressedRecord) in zip(records,uncompressedRecords)]
+    decodedRecords=[decodeRecord(record,defaults) for record in uncompressedRecords]
+    accounts=[values for (operation,values) in decodedRecords]
+    start=0
+    journalEntries=0
+    for (i,(operation,values)) in enumerate(decodedRecords):
+        if operation is not None:
+            if start<i:
+                insertAccountValuesToDB(accounts[start:i],tokens[start:i],recordSizes[start:i])
+            applyJournalEntry(operation,values)
+            journalEntries=journalEntries+1
+            start=i+1
+    insertAccountValuesToDB(accounts[start:],tokens[start:],recordSizes[start:])
+    addJournalEntries(journalEntries)
+    addCompressionStats(recordSizes)
+
+def selectAccountsToSave(dataKey):
+    #all accounts with encrypted line from password file
+    #ciphertext is None if account was added or changed after loading, or if
+    #accounts are saved using another data key than they were loaded with
+    sql="select accounts.rowid,%s,%s.token from accounts left join %s on %s.rowid=accounts.rowid order by accounts.%s" % (",".join(["accounts.%s" % column for column in DATABASE_ACCOUNTS_TABLE_COLUMNS]),CIPHERTEXT_TABLE,CIPHERTEXT_TABLE,CIPHERTEXT_TABLE,COLUMN_NAME)
+    rows=DATABASE_CURSOR.execute(sql).fetchall()
+    if dataKey != VAULT_DATA_KEY:
+        return [(row,None) for row in rows]
+    return [(row,row["token"]) for row in rows]
+
+def setAccountCiphertexts(rowidsAndTokens,replace=False):
+    #store encrypted lines of saved accounts, replace=True if all accounts were encrypted
+    #rowidsAndTokens are (rowid, token, (size, uncompressed size))
+    with DATABASE:
+        if replace:
+            DATABASE_CURSOR.execute("delete from %s" % CIPHERTEXT_TABLE)
+        DATABASE_CURSOR.executemany("insert or replace into %s (rowid,token,size,uncompressed_size) values (?,?,?,?)" % CIPHERTEXT_TABLE,((rowid,token,size,uncompressedSize) for (rowid,token,(size,uncompressedSize)) in rowidsAndTokens))
+
+def executeSelect(listOfColumnNames,whereNameStartsWith=None,orderBy=COLUMN_NAME,useID=False):
+    query=Query(listOfColumnNames,orderBy)
     if whereNameStartsWith is not None:
         if useID==False:
-            where="where name like \"%s%%\"" % whereNameStartsWith
+            query.startsWith(COLUMN_NAME,whereNameStartsWith)
         else:
-            where="where id = %s" % whereNameStartsWith
-            
-    if whereClause is not None:
-        where=whereClause
-    cols=",".join(listOfColumnNames)
-    orderClause=""
-    if orderBy is not None:
-        orderClause="order by %s" % orderBy
-    sql="select %s from accounts %s %s" % (cols,where,orderClause)
-    debug("executeSelect SQL: %s" % sql)
-    if returnSQLOnly==True:
-        return sql
-    else:
-        return DATABASE_CURSOR.execute(sql)
+            query.equals(COLUMN_ID,whereNameStartsWith)
+    return executeQuery(query)
 
 def executeSql(sql,params=None,commit=False):
     if params!=None:
@@ -115,32 +533,53 @@ def selectFirst(sql):
     #select and return first column and first row of sql result
     return (DATABASE_CURSOR.execute(sql).fetchone()[0])
 
-def insertAccountToDB(accountString):
-    accountDict=accountStringToDict(accountString)
-    columnNames=[]
-    values=[]
-    qmarks=[]
-    for key in accountDict.keys():
-        value=accountDict[key]
-        if value != "":
-            columnNames.append(key)
-            values.append(value)
-            qmarks.append("?")
-    sql=[]
+def getInsertTimestamp():
+    #same value as DEFAULT CURRENT_TIMESTAMP in accounts table
+    return time.strftime("%Y-%m-%d %H:%M:%S",time.gmtime())
 
-    sql.append("insert into accounts (")
-    sql.append(",".join(columnNames))
-    sql.append(") values (")
-    sql.append(",".join(qmarks))
-    sql.append(")")
-    sql="".join(sql)
-    #debug("SQL: %s" % sql)
-    #debug(tuple(values))
-    DATABASE_CURSOR.execute(sql,values)
+def insertAccountsToDB(accountStrings,tokens=None,recordSizes=None):
+    #insert decrypted account strings or records to database
+    #tokens are the encrypted lines of accounts, encrypted using VAULT_DATA_KEY
+    defaults=getRecordDefaults(getInsertTimestamp())
+    records=[accountString.encode("utf-8") if isinstance(accountString,str) else accountString for accountString in accountStrings]
+    insertAccountValuesToDB([decodeRecord(record,defaults)[1] for record in records],tokens,recordSizes)
+
+def insertAccountValuesToDB(accounts,tokens=None,recordSizes=None):
+    #insert accounts given as values of all accounts table columns
+    #all accounts are inserted using one prepared statement in a single transaction
+    sql="insert into accounts (rowid,%s) values (?,%s)" % (",".join(DATABASE_ACCOUNTS_TABLE_COLUMNS),",".join(["?"]*len(DATABASE_ACCOUNTS_TABLE_COLUMNS)))
+    with DATABASE:
+        #rowids are given so that ciphertexts can be stored using the same rowids
+        firstRowid=DATABASE_CURSOR.execute("select coalesce(max(rowid),0)+1 from accounts").fetchone()[0]
+        DATABASE_CURSOR.executemany(sql,((firstRowid+i,)+values for (i,values) in enumerate(accounts)))
+        if tokens is not None:
+            if recordSizes is None:
+                recordSizes=[(None,None)]*len(tokens)
+            DATABASE_CURSOR.executemany("insert into %s (rowid,token,size,uncompressed_size) values (?,?,?,?)" % CIPHERTEXT_TABLE,((firstRowid+i,token,size,uncompressedSize) for (i,(token,(size,uncompressedSize))) in enumerate(zip(tokens,recordSizes))))
 
-def insertAccountToFile(encryptionKey,accountString):
-    encryptedAccount=encryptString(encryptionKey,accountString)
-    appendStringToFile(GlobalVariables.CLI_PASSWORD_FILE,encryptedAccount)
+def insertAccountToFile(encryptionKey,accountDict):
+    vaultLoaded=isVaultLoaded(encryptionKey)
+    filename=GlobalVariables.CLI_PASSWORD_FILE
+    ([record],recordSizes)=compressRecords([encodeAccountRow(accountDict)])
+    if os.path.isfile(filename) and os.path.getsize(filename)>0:
+        encryptedAccount=getRecordCipher(encryptionKey).encrypt(record).decode("utf-8")
+        (appendStart,appendEnd)=appendStringToFile(filename,encryptedAccount)
+        if vaultLoaded and not setVaultAppended(encryptionKey,appendStart,appendEnd):
+            #other process appended to password file, its accounts and this account are read from file
+            loadAccounts(encryptionKey)
+            return
+    else:
+        #new password file
+        dataKey=createDataKey()
+        cipher=getNewVaultCipher()
+        encryptedAccount=getCipher(dataKey,cipher).encrypt(record).decode("utf-8")
+        createNewFile(filename,[makeVaultHeader(encryptionKey,dataKey,getVaultKdf(),cipher),encryptedAccount])
+        if vaultLoaded:
+            setVaultLoaded(encryptionKey,dataKey=dataKey)
+    if vaultLoaded:
+        #keep session vault in sync with password file
+        insertAccountsToDB([record],[encryptedAccount],recordSizes)
+        addCompressionStats(recordSizes)
 
 #import accounts to database
 #return False if no account file
@@ -149,40 +588,229 @@ def loadAccounts(encryptionKey=None,cmd=None):
     if encryptionKey==None:
         encryptionKey=GlobalVariables.KEY
 
+    if recoverInterruptedAppend(GlobalVariables.CLI_PASSWORD_FILE,backupBeforeRepair):
+        print("Removed incomplete append from password file.")
+    if removeStaleTempFiles(GlobalVariables.CLI_PASSWORD_FILE)>0:
+        debug("Removed temporary files of incomplete password file writes.")
+
     if os.path.isfile(GlobalVariables.CLI_PASSWORD_FILE) == False:
+        invalidateVault()
         if cmd != "add":
             print("No accounts. Add accounts using add-command.")
         return False
 
-    accounts=readFileAsList(GlobalVariables.CLI_PASSWORD_FILE)
-    for account in accounts:
-        if account==None or account=="":
-            continue
-        decryptedAccount=decryptString(encryptionKey,account)
-        insertAccountToDB(decryptedAccount)
+    if isVaultLoaded(encryptionKey):
+        #accounts already decrypted during this session
+        return True
+
+    appended=readAppendedAccounts(encryptionKey)
+    if appended is not None:
+        #decrypt only accounts added after last load
+        (signature,content)=appended
+        debug("Loading %d appended bytes" % len(content))
+        #key was verified when password file was loaded
+        insertEncryptedAccounts(VAULT_DATA_KEY,content,keyVerified=True)
+        setVaultLoaded(encryptionKey,signature,VAULT_TAIL+content)
+        fixAccountIds(encryptionKey)
+        return True
+
+    #password file rewritten or not yet loaded
+    invalidateVault()
+    #indexes are faster to create after inserting all accounts
+    dropIndexes()
+    try:
+        clearAccounts()
+        signature=getVaultSignature(GlobalVariables.CLI_PASSWORD_FILE)
+        content=readFileAsBytes(GlobalVariables.CLI_PASSWORD_FILE)
+        appendStart=getAppendInProgress(GlobalVariables.CLI_PASSWORD_FILE)
+        if appendStart is not None:
+            #other process is appending, its accounts are loaded when append is complete
+            content=content[:appendStart]
+        (header,accounts)=splitVaultHeader(content)
+        #passphrase is verified when data key is decrypted
+        dataKey=getHeaderDataKey(encryptionKey,header)
+        insertEncryptedAccounts(dataKey,accounts,keyVerified=header is not None)
+    finally:
+        createIndexes()
+    analyzeDatabase()
+    #signature size is what was read
+    signature=signature[0:3]+(len(content),)
+    setVaultLoaded(encryptionKey,signature,content[-VAULT_TAIL_LENGTH:],dataKey)
+    fixAccountIds(encryptionKey)
+    if header is None or header.get("kdf") is None:
+        upgradeVault(encryptionKey)
 
     return True
 
-def accountStringToDict(str):
-    account=str.split(FIELD_DELIM)
-    accountDict=dict()
-    for field in account:
-        ind=field.find(":")
-        name=field[0:ind]
-        value=field[ind+1:]
-        accountDict[name]=value
-        #print("%s == %s" % (name,value))
-    return accountDict
+def fixAccountIds(encryptionKey):
+    #repair missing and duplicate IDs of loaded accounts and save them
+    repairedAccounts=repairAccountIds()
+    if repairedAccounts>0 and encryptionKey==GlobalVariables.KEY:
+        #functions module imports this module
+        from ..utils.functions import saveAccounts
+        saveAccounts()
+        print("New ID given to %d accounts that had missing or duplicate ID." % repairedAccounts)
+
+def upgradeVault(encryptionKey):
+    #save password file without header using data key
+    #and password file header without key derivation using key derivation
+    if encryptionKey!=GlobalVariables.KEY:
+        #not loaded by user
+        return
+    #functions module imports this module
+    from ..utils.functions import saveAccounts,rewriteVaultHeader
+    header=readVaultHeader(GlobalVariables.CLI_PASSWORD_FILE)
+    if header is None:
+        if selectFirst("select count(*) from accounts")>0:
+            saveAccounts()
+            print("Password file converted to use data key.")
+    elif header.get("kdf") is None:
+        rewriteVaultHeader(encryptionKey)
+        print("Password file converted to use key derivation.")
+
+def backupBeforeRepair(filename):
+    #copy password file before it is modified when loading
+    createBackup(filename,Settings().getInt(SETTING_MAX_PASSWORD_FILE_BACKUPS))
+
+def insertEncryptedAccounts(encryptionKey,content,keyVerified=False):
+    #decrypt password file content and insert accounts to database
+    #lines that can not be decrypted are skipped and kept in DAMAGED_RECORDS
+    #raises InvalidToken if key is not verified and no line can be decrypted
+    accounts=[account.strip() for account in content.splitlines()]
+    accounts=[account for account in accounts if account!=b""]
+    try:
+        records=decryptAccounts(encryptionKey,accounts)
+    except InvalidToken:
+        (accounts,records)=decryptReadableAccounts(encryptionKey,accounts,keyVerified)
+    replayAccounts(records,[account.decode("utf-8") for account in accounts])
+    resetIdAllocator()
+
+def decryptReadableAccounts(encryptionKey,accounts,keyVerified):
+    #decrypt accounts one by one and return (readable accounts, decrypted records)
+    readableAccounts=[]
+    records=[]
+    damagedAccounts=[]
+    for account in accounts:
+        try:
+            records.append(decryptTokens(encryptionKey,[account])[0])
+            readableAccounts.append(account)
+        except InvalidToken:
+            damagedAccounts.append(account)
+    if not keyVerified and not readableAccounts:
+        #wrong passphrase
+        raise InvalidToken
+    DAMAGED_RECORDS.extend([account.decode("utf-8") for account in damagedAccounts])
+    printError("Skipped %d damaged entries of password file that could not be decrypted. They are kept in password file." % len(damagedAccounts))
+    return (readableAccounts,records)
+
+def getDecryptWorkers():
+    #number of worker processes from settings, auto uses all CPUs
+    workers=Settings().get(SETTING_DECRYPT_WORKERS)
+    if str(workers).lower()=="auto":
+        return os.cpu_count() or 1
+    try:
+        return max(int(workers),1)
+    except ValueError:
+        printError("Invalid %s setting: %s." % (SETTING_DECRYPT_WORKERS,workers))
+        return 1
+
+def decryptAccounts(encryptionKey,accounts):
+    #decrypt list of encrypted accounts (bytes) and return list of bytes
+    #large password files are split to chunks and decrypted in parallel
+    workers=getDecryptWorkers()
+    if workers<2 or len(accounts)<PARALLEL_DECRYPT_MIN_ACCOUNTS:
+        return decryptTokens(encryptionKey,accounts)
+
+    #few chunks per worker to even out load between processes
+    chunkSize=max(len(accounts)//(workers*4),1)
+    chunks=[accounts[i:i+chunkSize] for i in range(0,len(accounts),chunkSize)]
+    debug("Decrypting %d accounts using %d workers and %d chunks" % (len(accounts),workers,len(chunks)))
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            decryptedChunks=executor.map(decryptTokens,[encryptionKey]*len(chunks),chunks)
+            decryptedAccounts=[]
+            for decryptedChunk in decryptedChunks:
+                decryptedAccounts.extend(decryptedChunk)
+        return decryptedAccounts
+    except (OSError,BrokenProcessPool) as e:
+        #processes not available, decrypt in this process
+        debug("Parallel decrypt failed: %s" % e)
+        return decryptTokens(encryptionKey,accounts)
+
+class AccountIdsExhaustedError(Exception): pass
+
+class IdAllocator:
+    #allocates random unused account IDs between 1 and maximumId
+    #IDs are drawn using Fisher-Yates shuffle of the ID range that is done
+    #one step at a time, only swapped positions are stored in a dictionary
+    #used IDs are skipped when drawn, each of them at most once
+
+    def __init__(self,usedIds,maximumId):
+        self.maximumId=maximumId
+        self.usedIds=set([id for id in usedIds if 1<=id<=maximumId])
+        #IDs not yet drawn are positions 0..remaining-1 of the shuffled range
+        self.remaining=maximumId
+        self.swapped={}
+        self.available=maximumId-len(self.usedIds)
+
+    def draw(self):
+        position=randint(0,self.remaining-1)
+        last=self.remaining-1
+        id=self.swapped.get(position,position+1)
+        self.swapped[position]=self.swapped.get(last,last+1)
+        self.swapped.pop(last,None)
+        self.remaining=last
+        return id
+
+    def allocate(self):
+        if self.available<=0:
+            raise AccountIdsExhaustedError("All %d account IDs are in use." % self.maximumId)
+        id=self.draw()
+        while id in self.usedIds:
+            #used IDs are removed from range when drawn
+            self.usedIds.discard(id)
+            id=self.draw()
+        self.available=self.available-1
+        return id
+
+#allocator for accounts in database, created when first needed after loading accounts
+ID_ALLOCATOR=None
+
+def getIdAllocator():
+    global ID_ALLOCATOR
+    maximumId=Settings().getInt(SETTING_MAX_ID)
+    if ID_ALLOCATOR is None or ID_ALLOCATOR.maximumId!=maximumId:
+        rows=executeSelect([COLUMN_ID],orderBy=None)
+        ID_ALLOCATOR=IdAllocator([row[COLUMN_ID] for row in rows],maximumId)
+    return ID_ALLOCATOR
+
+def resetIdAllocator():
+    #call when accounts are loaded
+    global ID_ALLOCATOR
+    ID_ALLOCATOR=None
 
 def generateNewID():
-    newId=0
-    settingsObj=Settings()
-    while newId==0:
-        newId=randint(1, int(settingsObj.get(SETTING_MAX_ID)))
-        rows=executeSelect([COLUMN_ID],whereClause="where %s = %d" % (COLUMN_ID,newId) )
-        #print(rows)
-        for row in rows:
-            if row[COLUMN_ID] == None:
-                newId=0
-    return newId
-            
+    #raises AccountIdsExhaustedError if all IDs are in use
+    return getIdAllocator().allocate()
+
+def repairAccountIds():
+    #give new IDs to accounts that have zero ID or same ID as older account
+    #return number of repaired accounts
+    seenIds=set()
+    invalidRows=[]
+    rows=executeSelect(["rowid",COLUMN_ID],orderBy=COLUMN_CREATED)
+    for row in rows:
+        id=row[COLUMN_ID]
+        if not isinstance(id,int) or id<=0 or id in seenIds:
+            invalidRows.append(row["rowid"])
+        else:
+            seenIds.add(id)
+    if len(invalidRows)==0:
+        return 0
+    global ID_ALLOCATOR
+    ID_ALLOCATOR=IdAllocator(seenIds,Settings().getInt(SETTING_MAX_ID))
+    sql=updateSql((COLUMN_ID,),"rowid")
+    with DATABASE:
+        for rowid in invalidRows:
+            DATABASE_CURSOR.execute(sql,(ID_ALLOCATOR.allocate(),rowid))
+    return len(invalidRows)
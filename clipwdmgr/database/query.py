@@ -0,0 +1,149 @@
+#The MIT License (MIT)
+#
+#Copyright (c) 2015,2018 Sami Salkosuo
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#THE SOFTWARE.
+
+
+#query builder for accounts table
+#queries use bound parameters and SQL of a query depends only on the shape of
+#the query (columns, conditions and order), SQL is cached by shape so the same
+#statement is used again and sqlite reuses the compiled statement from its cache
+from functools import lru_cache
+
+from ..globals import *
+
+#maximum number of cached query shapes, also size of sqlite statement cache
+QUERY_CACHE_SIZE=128
+
+#condition types
+EQUALS="equals"
+STARTS_WITH="startswith"
+CONTAINS="contains"
+MATCH="match"
+
+#trigram index is used for substrings of at least this length
+TRIGRAM_MIN_LENGTH=3
+
+#escape character of like patterns
+LIKE_ESCAPE="\\"
+LIKE_SPECIAL_CHARACTERS=(LIKE_ESCAPE,"%","_")
+
+def escapeLike(value):
+    #user input is matched literally in like patterns
+    for character in LIKE_SPECIAL_CHARACTERS:
+        value=value.replace(character,LIKE_ESCAPE+character)
+    return value
+
+def hasLikeSpecialCharacters(value):
+    return any([character in value for character in LIKE_SPECIAL_CHARACTERS])
+
+class Query:
+
+    def __init__(self,columns,orderBy=COLUMN_NAME):
+        self.columns=tuple(columns)
+        self.orderBy=orderBy
+        #list of (condition type, tuple of columns, value)
+        self.conditions=[]
+        #(full-text table, tuple of bm25 weights) when results are ordered by relevance
+        self.fullText=None
+
+    def equals(self,column,value):
+        self.conditions.append((EQUALS,(column,),value))
+        return self
+
+    def startsWith(self,column,value):
+        self.conditions.append((STARTS_WITH,(column,),value))
+        return self
+
+    def contains(self,columns,value):
+        #value is substring of any of the given columns
+        if isinstance(columns,str):
+            columns=[columns]
+        self.conditions.append((CONTAINS,tuple(columns),value))
+        return self
+
+    def matches(self,table,fullTextQuery,weights):
+        #full-text query, results are ordered by relevance
+        self.conditions.append((MATCH,(table,),fullTextQuery))
+        self.fullText=(table,tuple(weights))
+        return self
+
+    def build(self,trigramColumns=()):
+        #return tuple (sql,params)
+        #trigramColumns are columns in trigram index that can be used for substrings
+        shape=[]
+        params=[]
+        for (conditionType,columns,value) in self.conditions:
+            indexed=()
+            #trigram index does not support like with escape, substrings with special characters are not searched from it
+            if conditionType==CONTAINS and len(value)>=TRIGRAM_MIN_LENGTH and not hasLikeSpecialCharacters(value):
+                indexed=tuple([column for column in columns if column in trigramColumns])
+            shape.append((conditionType,columns,indexed))
+            if conditionType==STARTS_WITH:
+                params.append("%s%%" % escapeLike(value))
+            elif conditionType==CONTAINS:
+                for column in columns:
+                    if column in indexed:
+                        params.append("%%%s%%" % value)
+                    params.append("%%%s%%" % escapeLike(value))
+            else:
+                params.append(value)
+        return (selectSql(self.columns,tuple(shape),self.orderBy,self.fullText),params)
+
+def conditionSql(conditionType,columns,indexed):
+    if conditionType==EQUALS:
+        return "accounts.%s = ?" % columns[0]
+    if conditionType==STARTS_WITH:
+        return "accounts.%s like ? escape '%s'" % (columns[0],LIKE_ESCAPE)
+    if conditionType==MATCH:
+        return "%s match ?" % columns[0]
+    conditions=[]
+    for column in columns:
+        if column in indexed:
+            #trigram index finds candidates, like-condition verifies them
+            conditions.append("(accounts.rowid in (select rowid from accounts_trigram where %s like ?) and accounts.%s like ? escape '%s')" % (column,column,LIKE_ESCAPE))
+        else:
+            conditions.append("accounts.%s like ? escape '%s'" % (column,LIKE_ESCAPE))
+    return "(%s)" % " or ".join(conditions)
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def selectSql(columns,shape,orderBy,fullText):
+    sql=["select %s from accounts" % ",".join(["accounts.%s" % column for column in columns])]
+    orderClause=[]
+    if fullText is not None:
+        (table,weights)=fullText
+        sql.append("join %s on accounts.rowid=%s.rowid" % (table,table))
+        orderClause.append("bm25(%s,%s)" % (table,",".join([str(weight) for weight in weights])))
+    if len(shape)>0:
+        sql.append("where %s" % " and ".join([conditionSql(*condition) for condition in shape]))
+    if orderBy is not None:
+        orderClause.append("accounts.%s" % orderBy)
+    if len(orderClause)>0:
+        sql.append("order by %s" % ",".join(orderClause))
+    return " ".join(sql)
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def updateSql(columns,keyColumn):
+    #update given columns of account identified by keyColumn
+    return "update accounts set %s where %s=?" % (",".join(["%s=?" % column for column in columns]),keyColumn)
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def deleteSql(keyColumn):
+    return "delete from accounts where %s=?" % keyColumn
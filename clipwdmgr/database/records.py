@@ -0,0 +1,201 @@
+#The MIT License (MIT)
+#
+#Copyright (c) 2015,2018 Sami Salkosuo
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#THE SOFTWARE.
+
+#
+#account records, plaintext of accounts and journal entries in password file
+#
+#record fields are tagged and length prefixed, field names are not repeated
+#in every record and values can contain any characters
+#  schema version, 1 byte
+#  record type, 1 byte
+#  number of fields n, 1 byte
+#  field tags, n bytes
+#  field lengths in characters, n unsigned 32-bit little endian integers
+#  field values, concatenated and UTF-8 encoded
+#empty fields are not stored
+#
+#records of previous versions are text: NAME:value|||::|||URL:value...
+#text records start with field name, binary records with schema version
+#
+#compressed records start with compression method, followed by compressed record
+#records are compressed only if they are at least given size and compression makes them smaller
+import lzma
+import struct
+import zlib
+
+from ..globals import *
+
+RECORD_SCHEMA_VERSION=1
+#first byte of text records is a letter
+RECORD_MAX_SCHEMA_VERSION=0x1f
+
+#record types
+RECORD_ACCOUNT=0
+RECORD_JOURNAL_UPSERT=1
+RECORD_JOURNAL_DELETE=2
+#journal operation of record type, None for account
+RECORD_OPERATIONS={
+    RECORD_ACCOUNT:None,
+    RECORD_JOURNAL_UPSERT:JOURNAL_UPSERT,
+    RECORD_JOURNAL_DELETE:JOURNAL_DELETE,
+    }
+RECORD_TYPES=dict([(operation,recordType) for (recordType,operation) in RECORD_OPERATIONS.items()])
+
+#field tags, tags must not be changed or reused
+#fields with unknown tags are ignored when decoding
+RECORD_FIELD_TAGS={
+    COLUMN_CREATED:1,
+    COLUMN_UPDATED:2,
+    COLUMN_NAME:3,
+    COLUMN_URL:4,
+    COLUMN_USERNAME:5,
+    COLUMN_EMAIL:6,
+    COLUMN_PASSWORD:7,
+    COLUMN_COMMENT:8,
+    COLUMN_ID:9,
+    }
+#index of field in accounts table columns
+RECORD_TAG_INDEXES=dict([(RECORD_FIELD_TAGS[column],i) for (i,column) in enumerate(DATABASE_ACCOUNTS_TABLE_COLUMNS)])
+
+RECORD_HEADER=struct.Struct("<BBB")
+
+#first byte of compressed records, between schema versions and text records
+RECORD_COMPRESSION_METHODS={
+    COMPRESSION_ZLIB:0x11,
+    COMPRESSION_LZMA:0x12,
+    }
+#raw streams without headers and checksums, records are authenticated by cipher
+RECORD_LZMA_FILTERS=[{"id":lzma.FILTER_LZMA2,"preset":6}]
+RECORD_COMPRESSORS={
+    COMPRESSION_ZLIB:lambda data: zlib.compress(data,9,-15),
+    COMPRESSION_LZMA:lambda data: lzma.compress(data,format=lzma.FORMAT_RAW,filters=RECORD_LZMA_FILTERS),
+    }
+RECORD_DECOMPRESSORS={
+    RECORD_COMPRESSION_METHODS[COMPRESSION_ZLIB]:lambda data: zlib.decompress(data,-15),
+    RECORD_COMPRESSION_METHODS[COMPRESSION_LZMA]:lambda data: lzma.decompress(data,format=lzma.FORMAT_RAW,filters=RECORD_LZMA_FILTERS),
+    }
+
+def getRecordDefaults(timestamp):
+    #values of accounts table columns for fields that are missing or empty
+    #timestamp is the same as DEFAULT CURRENT_TIMESTAMP in accounts table
+    defaults=[]
+    for column in DATABASE_ACCOUNTS_TABLE_COLUMNS:
+        if column in DATABASE_ACCOUNTS_TABLE_COLUMN_IS_TIMESTAMP:
+            defaults.append(timestamp)
+        elif column in DATABASE_ACCOUNTS_TABLE_COLUMN_IS_INTEGER:
+            defaults.append(0)
+        else:
+            defaults.append("")
+    return tuple(defaults)
+
+def encodeAccountRow(row,columns=None,operation=None,compression=None):
+    #encode account row or dictionary to record
+    #operation is JOURNAL_UPSERT or JOURNAL_DELETE for journal entries
+    #compression is tuple (compression method, minimum record size) or None
+    if columns==None:
+        columns=row.keys()
+    tags=[]
+    values=[]
+    for column in columns:
+        value=row[column]
+        if value == None:
+            continue
+        value=str(value).strip()
+        if value == "":
+            continue
+        tags.append(RECORD_FIELD_TAGS[column])
+        values.append(value)
+    if len(tags)>255:
+        raise ValueError("Too many fields in account record.")
+    lengths=struct.pack("<%dI" % len(values),*[len(value) for value in values])
+    record=RECORD_HEADER.pack(RECORD_SCHEMA_VERSION,RECORD_TYPES[operation],len(tags))+bytes(tags)+lengths+"".join(values).encode("utf-8")
+    if compression is not None:
+        record=compressRecord(record,*compression)
+    return record
+
+def compressRecord(record,method,minimumSize):
+    #return compressed record or record if it is small or does not compress
+    if method==COMPRESSION_NONE or len(record)<minimumSize:
+        return record
+    compressedRecord=bytes([RECORD_COMPRESSION_METHODS[method]])+RECORD_COMPRESSORS[method](record)
+    if len(compressedRecord)>=len(record):
+        return record
+    return compressedRecord
+
+def decompressRecord(record):
+    #return uncompressed record
+    decompress=RECORD_DECOMPRESSORS.get(record[0])
+    if decompress is None:
+        return record
+    return decompress(record[1:])
+
+def isCompressedRecord(record):
+    return record[0] in RECORD_DECOMPRESSORS
+
+def decodeRecord(record,defaults):
+    #decode binary or text record to (journal operation, values of accounts table columns)
+    #defaults are from getRecordDefaults, operation is None for accounts
+    record=decompressRecord(record)
+    if record[0]>RECORD_MAX_SCHEMA_VERSION:
+        return decodeTextRecord(record.decode("utf-8"),defaults)
+    (version,recordType,count)=RECORD_HEADER.unpack_from(record)
+    if version>RECORD_SCHEMA_VERSION or recordType not in RECORD_OPERATIONS:
+        raise ValueError("Unsupported account record version %d type %d." % (version,recordType))
+    tagsEnd=RECORD_HEADER.size+count
+    lengths=struct.unpack_from("<%dI" % count,record,tagsEnd)
+    text=record[tagsEnd+4*count:].decode("utf-8")
+    values=list(defaults)
+    start=0
+    for (tag,length) in zip(record[RECORD_HEADER.size:tagsEnd],lengths):
+        index=RECORD_TAG_INDEXES.get(tag)
+        if index is not None:
+            values[index]=text[start:start+length]
+        start=start+length
+    return (RECORD_OPERATIONS[recordType],tuple(values))
+
+def decodeTextRecord(accountString,defaults):
+    #missing and empty fields get the column default value
+    accountDict=accountStringToDict(accountString)
+    values=[]
+    for (column,default) in zip(DATABASE_ACCOUNTS_TABLE_COLUMNS,defaults):
+        value=accountDict.get(column,"")
+        if value == "":
+            value=default
+        values.append(value)
+    return (accountDict.get(JOURNAL_FIELD),tuple(values))
+
+def isJournalRecord(record):
+    record=decompressRecord(record)
+    if record[0]>RECORD_MAX_SCHEMA_VERSION:
+        return record.startswith(JOURNAL_FIELD.encode("utf-8")+b":")
+    return record[1]!=RECORD_ACCOUNT
+
+def accountStringToDict(str):
+    account=str.split(FIELD_DELIM)
+    accountDict=dict()
+    for field in account:
+        ind=field.find(":")
+        name=field[0:ind]
+        value=field[ind+1:]
+        accountDict[name]=value
+        #print("%s == %s" % (name,value))
+    return accountDict
@@ -42,6 +42,43 @@ PROMPTSTRING="pwdmgr>"
 
 FIELD_DELIM="|||::|||"
 
+#journal entries in password file, first field of entry is JOURNAL:<operation>
+#upsert: replace accounts that have the same CREATED or add account
+#delete: delete accounts that have the same CREATED
+JOURNAL_FIELD="JOURNAL"
+JOURNAL_UPSERT="upsert"
+JOURNAL_DELETE="delete"
+#password file formats
+#snapshot: every change rewrites password file
+#journal: changes are appended as journal entries, compacted to snapshot when needed
+VAULT_FORMAT_SNAPSHOT="snapshot"
+VAULT_FORMAT_JOURNAL="journal"
+#first line of password file is header: prefix followed by JSON object
+#key: data key encrypted using key derived from passphrase, accounts are encrypted using data key
+#password files without header are encrypted using passphrase key
+VAULT_HEADER_PREFIX="clipwdmgr-vault "
+#version 2: kdf, key derivation function and its parameters
+#version 3: cipher, cipher of accounts
+#version 4: accounts are binary records, see database/records.py
+VAULT_HEADER_VERSION=4
+#ciphers of accounts in password file
+CIPHER_FERNET="fernet"
+CIPHER_AES_GCM="aes-256-gcm"
+CIPHER_CHACHA20_POLY1305="chacha20-poly1305"
+#compression of account records in password file
+COMPRESSION_NONE="none"
+COMPRESSION_ZLIB="zlib"
+COMPRESSION_LZMA="lzma"
+#key derivation functions
+KDF_SCRYPT="scrypt"
+KDF_PBKDF2="pbkdf2"
+KDF_SCRYPT_R=8
+KDF_SCRYPT_P=1
+#limits for kdf-calibrate
+KDF_SCRYPT_MIN_N=2**14
+KDF_SCRYPT_MAX_N=2**20
+KDF_PBKDF2_MIN_ITERATIONS=100000
+
 #columns for ACCOUNTS table and also fields in account string
 COLUMN_NAME="NAME"
 #CREATED column uniquely identifies account, highly unlikely that two accounts are created at the same time :-)
@@ -57,6 +94,21 @@ COLUMN_ID="ID"
 DATABASE_ACCOUNTS_TABLE_COLUMNS=[COLUMN_CREATED,COLUMN_UPDATED,COLUMN_NAME,COLUMN_URL,COLUMN_USERNAME,COLUMN_EMAIL,COLUMN_PASSWORD,COLUMN_COMMENT,COLUMN_ID]
 DATABASE_ACCOUNTS_TABLE_COLUMN_IS_TIMESTAMP=[COLUMN_CREATED,COLUMN_UPDATED]
 DATABASE_ACCOUNTS_TABLE_COLUMN_IS_INTEGER=[COLUMN_ID]
+#indexes of accounts table: (index name, column, collation)
+#NAME index is case insensitive so that prefix search 'name like "x%"' can use it
+DATABASE_ACCOUNTS_TABLE_INDEXES=[
+    ("accounts_name",COLUMN_NAME,"NOCASE"),
+    ("accounts_id",COLUMN_ID,None),
+    ("accounts_created",COLUMN_CREATED,None),
+    ("accounts_username",COLUMN_USERNAME,None),
+    ("accounts_email",COLUMN_EMAIL,None)
+    ]
+#columns in full-text search index, used by search-command
+DATABASE_ACCOUNTS_FTS_COLUMNS=[COLUMN_NAME,COLUMN_URL,COLUMN_COMMENT]
+#bm25 weights of full-text search columns, match in name ranks highest
+DATABASE_ACCOUNTS_FTS_WEIGHTS=[10.0,5.0,1.0]
+#columns in trigram index, used to find substrings
+DATABASE_ACCOUNTS_TRIGRAM_COLUMNS=[COLUMN_NAME,COLUMN_URL,COLUMN_COMMENT,COLUMN_USERNAME,COLUMN_EMAIL]
 
 
 CLIPWDMGR_ACCOUNTS_FILE_NAME="clipwdmgr_accounts.txt"
@@ -83,6 +135,21 @@ SETTING_COPY_PASSWORD_ON_VIEW="copy_password_to_clipboard"
 SETTING_MAX_PASSWORD_FILE_BACKUPS="max_password_file_backups"
 SETTING_ENABLE_CLIPBOARD_COPY="enable_clipboard_copy"
 SETTING_MAX_ID="maximum_id"
+SETTING_DECRYPT_WORKERS="decrypt_workers"
+SETTING_TRIGRAM_INDEX="trigram_index"
+SETTING_AGENT_IDLE_TIMEOUT="agent_idle_timeout"
+SETTING_CLIPBOARD_POLL_INTERVAL="clipboard_poll_interval"
+SETTING_CLIPBOARD_BACKEND="clipboard_backend"
+SETTING_CLIPBOARD_CLEAR_SECONDS="clipboard_clear_seconds"
+SETTING_VAULT_FORMAT="password_file_format"
+SETTING_JOURNAL_COMPACT_ENTRIES="journal_compact_entries"
+SETTING_DURABLE_APPENDS="durable_appends"
+SETTING_KDF="kdf"
+SETTING_KDF_SCRYPT_N="kdf_scrypt_n"
+SETTING_KDF_PBKDF2_ITERATIONS="kdf_pbkdf2_iterations"
+SETTING_CIPHER="cipher"
+SETTING_COMPRESSION="record_compression"
+SETTING_COMPRESSION_MIN_SIZE="record_compression_min_size"
 #settings default values, if setting file does not exist
 #these are saved to settings file
 SETTING_DEFAULT_VALUES={
@@ -94,7 +161,51 @@ SETTING_DEFAULT_VALUES={
     SETTING_COPY_PASSWORD_ON_VIEW:True,
     SETTING_ENABLE_CLIPBOARD_COPY:True,
     SETTING_MAX_PASSWORD_FILE_BACKUPS:10,
-    SETTING_MAX_ID:9999
+    SETTING_MAX_ID:9999,
+    #number of processes used to decrypt password file, auto=number of CPUs
+    SETTING_DECRYPT_WORKERS:"auto",
+    #index substrings of account fields, speeds up substring search
+    SETTING_TRIGRAM_INDEX:True,
+    #seconds before idle agent exits, 0=never
+    SETTING_AGENT_IDLE_TIMEOUT:900,
+    #seconds between clipboard reads for bottom toolbar
+    SETTING_CLIPBOARD_POLL_INTERVAL:0.5,
+    #auto, xclip, xsel, wl-copy, cygwin, pyperclip or memory
+    SETTING_CLIPBOARD_BACKEND:"auto",
+    #seconds before copied text is cleared from clipboard, 0=do not clear
+    SETTING_CLIPBOARD_CLEAR_SECONDS:0,
+    #snapshot or journal
+    SETTING_VAULT_FORMAT:VAULT_FORMAT_SNAPSHOT,
+    #journal password file is compacted when it has this many journal entries
+    SETTING_JOURNAL_COMPACT_ENTRIES:500,
+    #fsync password file after appending accounts and journal entries
+    SETTING_DURABLE_APPENDS:False,
+    #key derivation function of passphrase: scrypt or pbkdf2, kdf-calibrate sets these
+    SETTING_KDF:KDF_SCRYPT,
+    SETTING_KDF_SCRYPT_N:2**15,
+    SETTING_KDF_PBKDF2_ITERATIONS:600000,
+    #cipher of new password files and migrate-command: aes-256-gcm, chacha20-poly1305 or fernet
+    SETTING_CIPHER:CIPHER_AES_GCM,
+    #compression of accounts before encryption: none, zlib or lzma
+    SETTING_COMPRESSION:COMPRESSION_NONE,
+    #accounts smaller than this many bytes are not compressed
+    SETTING_COMPRESSION_MIN_SIZE:512
+}
+
+#password files with fewer accounts than this are decrypted in a single process
+#because starting worker processes takes longer than decrypting
+PARALLEL_DECRYPT_MIN_ACCOUNTS=2000
+
+#startup time budget in seconds for command line modes, checked with --timings
+#time from start of clipwdmgr imports to end of command, excluding interpreter startup,
+#passphrase prompt and the command itself (decryption, command execution)
+STARTUP_TIME_BUDGET={
+    #-c or -d executed by agent
+    "agent":0.05,
+    #-d
+    "decrypt":0.08,
+    #-c
+    "cmd":0.12,
 }
 
 
@@ -0,0 +1,194 @@
+#The MIT License (MIT)
+#
+#Copyright (c) 2015,2018 Sami Salkosuo
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#THE SOFTWARE.
+
+#
+#agent
+#
+#opt-in background process that holds unlocked and loaded password file
+#one-shot command line calls forward commands to agent over Unix domain socket
+#so that they do not need passphrase or to decrypt password file again
+#
+
+import os
+import io
+import sys
+import json
+import stat
+import struct
+import socket
+import tempfile
+import contextlib
+
+#commands that ask user input can not be executed by agent
+AGENT_INTERACTIVE_COMMANDS=["add","edit","delete","changepassphrase","exit"]
+
+AGENT_SOCKET_FILE_NAME="agent.sock"
+AGENT_CONNECT_TIMEOUT=0.5
+AGENT_MAX_REQUEST_SIZE=1024*1024
+
+#directory for agent socket, not data dir because data dir may be synced to cloud
+def getAgentDirectory():
+    runtimeDir=os.environ.get("XDG_RUNTIME_DIR")
+    if runtimeDir == None or os.path.isdir(runtimeDir) == False:
+        runtimeDir=tempfile.gettempdir()
+    return os.path.join(runtimeDir,"clipwdmgr-%d" % os.getuid())
+
+def getAgentSocketFile():
+    return os.path.join(getAgentDirectory(),AGENT_SOCKET_FILE_NAME)
+
+#create agent directory readable only by current user
+#refuse to use existing directory if it is accessible by others
+def createAgentDirectory():
+    agentDir=getAgentDirectory()
+    try:
+        os.mkdir(agentDir,0o700)
+    except FileExistsError:
+        pass
+    st=os.lstat(agentDir)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or stat.S_IMODE(st.st_mode) & 0o077:
+        raise PermissionError("Agent directory %s must be a directory owned by current user with mode 0700." % agentDir)
+    return agentDir
+
+def isInteractiveCommand(cmd):
+    try:
+        name=cmd.split()[0]
+    except IndexError:
+        return False
+    return name in AGENT_INTERACTIVE_COMMANDS
+
+#check that connecting process is run by the same user
+#socket file permissions already restrict this, SO_PEERCRED is Linux only
+def isPeerAllowed(connection):
+    if not hasattr(socket,"SO_PEERCRED"):
+        return True
+    credentials=connection.getsockopt(socket.SOL_SOCKET,socket.SO_PEERCRED,struct.calcsize("3i"))
+    (pid,uid,gid)=struct.unpack("3i",credentials)
+    return uid == os.getuid()
+
+def receiveMessage(connection):
+    data=b""
+    while not data.endswith(b"\n"):
+        chunk=connection.recv(65536)
+        if not chunk:
+            break
+        data=data+chunk
+        if len(data) > AGENT_MAX_REQUEST_SIZE:
+            raise ValueError("Agent message too large.")
+    if data == b"":
+        return None
+    return json.loads(data.decode("utf-8"))
+
+def sendMessage(connection,message):
+    connection.sendall(json.dumps(message).encode("utf-8")+b"\n")
+
+#send request to agent and return response
+#returns None if agent is not running
+def sendAgentRequest(request):
+    connection=socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+    connection.settimeout(AGENT_CONNECT_TIMEOUT)
+    try:
+        connection.connect(getAgentSocketFile())
+    except (FileNotFoundError,ConnectionRefusedError,socket.timeout):
+        connection.close()
+        return None
+    try:
+        #agent may take a while to execute commands
+        connection.settimeout(None)
+        sendMessage(connection,request)
+        return receiveMessage(connection)
+    finally:
+        connection.close()
+
+#execute request and return output
+#executeFunction(request) executes request and prints output
+def handleAgentRequest(connection,executeFunction):
+    if isPeerAllowed(connection) == False:
+        return True
+    request=receiveMessage(connection)
+    if request == None or request.get("ping"):
+        sendMessage(connection,{"output":""})
+        return True
+    if request.get("stop"):
+        sendMessage(connection,{"output":"Agent stopped.\n"})
+        return False
+    output=io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            executeFunction(request)
+        except Exception:
+            import traceback
+            print(traceback.format_exc())
+    sendMessage(connection,{"output":output.getvalue()})
+    return True
+
+#serve requests until idle timeout expires or agent is stopped
+def runAgent(executeFunction,idleTimeout):
+    createAgentDirectory()
+    socketFile=getAgentSocketFile()
+    try:
+        os.remove(socketFile)
+    except FileNotFoundError:
+        pass
+    server=socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+    #socket file is created with mode 0600
+    oldUmask=os.umask(0o177)
+    try:
+        server.bind(socketFile)
+    finally:
+        os.umask(oldUmask)
+    server.listen(5)
+    if idleTimeout > 0:
+        server.settimeout(idleTimeout)
+    try:
+        running=True
+        while running:
+            try:
+                (connection,address)=server.accept()
+            except socket.timeout:
+                #idle timeout
+                break
+            try:
+                connection.settimeout(None)
+                running=handleAgentRequest(connection,executeFunction)
+            except (OSError,ValueError):
+                pass
+            finally:
+                connection.close()
+    finally:
+        server.close()
+        try:
+            os.remove(socketFile)
+        except FileNotFoundError:
+            pass
+
+#detach from terminal, parent process returns False and child returns True
+def daemonize():
+    if os.fork() > 0:
+        return False
+    os.setsid()
+    if os.fork() > 0:
+        os._exit(0)
+    devNull=os.open(os.devnull,os.O_RDWR)
+    for fd in range(3):
+        os.dup2(devNull,fd)
+    os.close(devNull)
+    return True
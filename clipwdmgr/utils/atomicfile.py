@@ -0,0 +1,211 @@
+#The MIT License (MIT)
+#
+#Copyright (c) 2015,2018 Sami Salkosuo
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#THE SOFTWARE.
+
+#
+#atomicfile
+#
+#all password file and settings file writes go through this module
+#new content is written to temporary file that replaces the file, so file is always complete
+#appends are undone if they do not finish, using a marker file written before appending
+#
+
+import os
+import re
+import glob
+import errno
+import tempfile
+
+#marker file next to appended file, content is file size before append and process id
+APPEND_MARKER_SUFFIX=".pending"
+
+#Windows API values for checking if process is running
+WINDOWS_PROCESS_QUERY_LIMITED_INFORMATION=0x1000
+WINDOWS_STILL_ACTIVE=259
+WINDOWS_ERROR_ACCESS_DENIED=5
+
+def writeBytes(file,data):
+    #all data is written using this function, fault injection replaces it
+    file.write(data)
+
+def fsyncDirectory(directory):
+    #make rename, create and delete durable, not possible on all platforms
+    try:
+        fd=os.open(directory,os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def getDirectory(filename):
+    return os.path.dirname(os.path.abspath(filename))
+
+def getTempFilePrefix(filename,pid):
+    #temporary files are .<file name>.<process id>.<random>
+    return ".%s.%d." % (os.path.basename(filename),pid)
+
+def removeStaleTempFiles(filename):
+    #remove temporary files of writes that did not complete because process stopped
+    #returns number of removed files
+    filename=os.path.realpath(filename)
+    directory=getDirectory(filename)
+    pattern=re.compile(re.escape(".%s." % os.path.basename(filename))+r"([0-9]+)\.[A-Za-z0-9_]+$")
+    removed=0
+    for tempFile in glob.glob(os.path.join(glob.escape(directory),glob.escape(".%s." % os.path.basename(filename))+"*")):
+        match=pattern.match(os.path.basename(tempFile))
+        if match is None:
+            continue
+        pid=int(match.group(1))
+        if pid!=os.getpid() and isProcessRunning(pid):
+            #other process is writing
+            continue
+        try:
+            os.remove(tempFile)
+            removed=removed+1
+        except OSError:
+            pass
+    return removed
+
+def writeFileAtomically(filename,data):
+    #write data to temporary file in the same directory, fsync and rename it over filename
+    #symbolic link is not replaced, file that it points to is written
+    filename=os.path.realpath(filename)
+    directory=getDirectory(filename)
+    removeStaleTempFiles(filename)
+    (fd,tempFile)=tempfile.mkstemp(dir=directory,prefix=getTempFilePrefix(filename,os.getpid()))
+    try:
+        with os.fdopen(fd,"wb") as file:
+            writeBytes(file,data)
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.isfile(filename):
+            #keep permissions of existing file, new files are readable only by owner
+            os.chmod(tempFile,os.stat(filename).st_mode & 0o7777)
+        os.replace(tempFile,filename)
+    except:
+        os.remove(tempFile)
+        raise
+    fsyncDirectory(directory)
+
+def getAppendMarker(filename):
+    return filename+APPEND_MARKER_SUFFIX
+
+def appendToFileAtomically(filename,data,durable=False):
+    #append data to file, file is truncated back if append fails
+    #durable appends are on disk when this function returns
+    #returns file offset after appended data
+    marker=getAppendMarker(filename)
+    size=os.path.getsize(filename) if os.path.isfile(filename) else 0
+    with open(marker,"w") as file:
+        file.write("%d %d" % (size,os.getpid()))
+        if durable:
+            file.flush()
+            os.fsync(file.fileno())
+    if durable:
+        fsyncDirectory(getDirectory(filename))
+    try:
+        with open(filename,"ab") as file:
+            writeBytes(file,data)
+            file.flush()
+            #end of this append even if other process appended before it
+            end=file.tell()
+            if durable:
+                os.fsync(file.fileno())
+    except:
+        os.truncate(filename,size)
+        os.remove(marker)
+        raise
+    os.remove(marker)
+    return end
+
+def isProcessRunning(pid):
+    if os.name=="nt":
+        #os.kill terminates process on Windows
+        return isWindowsProcessRunning(pid)
+    try:
+        os.kill(pid,0)
+    except OSError as e:
+        return e.errno==errno.EPERM
+    return True
+
+def isWindowsProcessRunning(pid):
+    import ctypes
+    kernel32=ctypes.WinDLL("kernel32",use_last_error=True)
+    handle=kernel32.OpenProcess(WINDOWS_PROCESS_QUERY_LIMITED_INFORMATION,False,pid)
+    if not handle:
+        #process of other user is running
+        return ctypes.get_last_error()==WINDOWS_ERROR_ACCESS_DENIED
+    try:
+        exitCode=ctypes.c_ulong()
+        if not kernel32.GetExitCodeProcess(handle,ctypes.byref(exitCode)):
+            #assume running so that its files are not removed
+            return True
+        return exitCode.value==WINDOWS_STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+def readAppendMarker(filename):
+    #return (file size before append, process id) or None if there is no complete marker
+    try:
+        with open(getAppendMarker(filename)) as file:
+            (size,pid)=[int(value) for value in file.read().split()]
+    except (OSError,ValueError):
+        return None
+    return (size,pid)
+
+def getAppendInProgress(filename):
+    #return file size before append if other running process is appending, otherwise None
+    #bytes after that size are not yet completely written
+    marker=readAppendMarker(filename)
+    if marker is None:
+        return None
+    (size,pid)=marker
+    if pid!=os.getpid() and isProcessRunning(pid):
+        return size
+    return None
+
+def recoverInterruptedAppend(filename,beforeTruncate=None):
+    #truncate file to size before append, if process stopped while appending
+    #beforeTruncate is called before file is truncated, for example to back up the file
+    #returns True if file was truncated
+    marker=getAppendMarker(filename)
+    appendMarker=readAppendMarker(filename)
+    if appendMarker is None:
+        #no marker or marker was not completely written before append started
+        if os.path.isfile(marker):
+            os.remove(marker)
+        return False
+    (size,pid)=appendMarker
+    if pid!=os.getpid() and isProcessRunning(pid):
+        #other process is appending
+        return False
+    truncated=False
+    if os.path.isfile(filename) and os.path.getsize(filename)>size:
+        if beforeTruncate is not None:
+            beforeTruncate(filename)
+        os.truncate(filename,size)
+        truncated=True
+    os.remove(marker)
+    return truncated
@@ -0,0 +1,128 @@
+#The MIT License (MIT)
+#
+#Copyright (c) 2015,2018 Sami Salkosuo
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#THE SOFTWARE.
+
+#
+#backups
+#
+#password file backups are copies of password file named <password file>-backup-<timestamp>
+#one copy is made before password file is changed and oldest backups are removed
+#
+
+import os
+import re
+import glob
+import shutil
+import tempfile
+from datetime import datetime,timezone
+
+from .atomicfile import *
+
+BACKUP_NAME_TEMPLATE="%s-backup-%s"
+BACKUP_TIMESTAMP_FORMAT="%Y%m%d-%H%M%S-%f"
+#numbered backups of previous versions: <password file>-v<version>-<number>
+LEGACY_BACKUP_NAME_PATTERN=r"-v[0-9][0-9.]*-[0-9]+"
+
+def getBackupTimestamp(backupFile,passwordFile):
+    #returns datetime of backup or None if file is not a backup of password file
+    prefix=BACKUP_NAME_TEMPLATE % (passwordFile,"")
+    if not backupFile.startswith(prefix):
+        return None
+    try:
+        return datetime.strptime(backupFile[len(prefix):],BACKUP_TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+#returns list of backup files, newest first
+def getBackupFiles(passwordFile):
+    backups=[]
+    for backupFile in glob.glob(glob.escape(BACKUP_NAME_TEMPLATE % (passwordFile,"")) + "*"):
+        if getBackupTimestamp(backupFile,passwordFile) != None:
+            backups.append(backupFile)
+    #timestamp format sorts by time
+    backups.sort(reverse=True)
+    return backups
+
+#copy password file to new backup and remove oldest backups
+#if password file is going to be replaced by a new file, backup is a hard link to the current file
+#returns backup file name or None if password file does not exist
+def createBackup(passwordFile,maxBackups,link=False):
+    if os.path.isfile(passwordFile)==False:
+        return None
+    timestamp=datetime.now(timezone.utc)
+    backupFile=BACKUP_NAME_TEMPLATE % (passwordFile,timestamp.strftime(BACKUP_TIMESTAMP_FORMAT))
+    while os.path.exists(backupFile):
+        #many backups during the same microsecond
+        timestamp=timestamp.replace(microsecond=(timestamp.microsecond+1) % 1000000)
+        backupFile=BACKUP_NAME_TEMPLATE % (passwordFile,timestamp.strftime(BACKUP_TIMESTAMP_FORMAT))
+    if link:
+        try:
+            #link to the file, not to symbolic link
+            os.link(os.path.realpath(passwordFile),backupFile)
+        except OSError:
+            #hard links not supported
+            link=False
+    if not link:
+        shutil.copy2(passwordFile,backupFile)
+    pruneBackups(passwordFile,maxBackups)
+    return backupFile
+
+#returns list of numbered backup files of previous versions, newest first
+def getLegacyBackupFiles(passwordFile):
+    pattern=re.compile(re.escape(passwordFile)+LEGACY_BACKUP_NAME_PATTERN+"$")
+    backups=[backupFile for backupFile in glob.glob(glob.escape(passwordFile)+"-v*") if pattern.match(backupFile)]
+    backups.sort(key=os.path.getmtime,reverse=True)
+    return backups
+
+#remove oldest backups, numbered backups of previous versions are older than timestamped backups
+def pruneBackups(passwordFile,maxBackups):
+    for backupFile in (getBackupFiles(passwordFile)+getLegacyBackupFiles(passwordFile))[max(maxBackups,1):]:
+        os.remove(backupFile)
+
+#hard link backup has the same content as password file until password file is replaced
+#if replacing fails, link is changed to a copy so that appends to password file do not change backup
+def unlinkBackup(backupFile):
+    if backupFile is None or os.stat(backupFile).st_nlink<2:
+        return
+    (fd,tempFile)=tempfile.mkstemp(dir=getDirectory(backupFile),prefix=getTempFilePrefix(backupFile,os.getpid()))
+    os.close(fd)
+    try:
+        shutil.copy2(backupFile,tempFile)
+        os.replace(tempFile,backupFile)
+    except:
+        os.remove(tempFile)
+        raise
+
+#replace password file with backup, current password file is backed up first
+#beforeRestore is called with backup content before anything is changed, for example to
+#check that backup can be decrypted, password file is not replaced if it raises exception
+def restoreBackup(backupFile,passwordFile,maxBackups,beforeRestore=None):
+    #read before backing up, restored backup may be the oldest one that is removed
+    with open(backupFile,"rb") as file:
+        content=file.read()
+    if beforeRestore is not None:
+        beforeRestore(content)
+    currentBackup=createBackup(passwordFile,maxBackups,link=True)
+    try:
+        writeFileAtomically(passwordFile,content)
+    except:
+        unlinkBackup(currentBackup)
+        raise
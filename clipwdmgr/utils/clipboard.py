@@ -0,0 +1,352 @@
+#The MIT License (MIT)
+#
+#Copyright (c) 2015,2018 Sami Salkosuo
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#THE SOFTWARE.
+
+#
+#clipboard
+#
+#clipboard backends, clipboard service and clipboard monitor
+#service copies to clipboard in background thread so that prompt does not wait for
+#clipboard subprocess, and clears clipboard after given time
+#monitor polls clipboard in background thread so that bottom toolbar does not
+#start clipboard subprocess (xclip, xsel) every time it is drawn
+#
+
+import os
+import time
+import queue
+import atexit
+import shutil
+import threading
+import subprocess
+
+#clipboard backend interface
+class ClipboardBackend:
+
+    def copy(self,text):
+        pass
+
+    def paste(self):
+        return ""
+
+class PyperclipBackend(ClipboardBackend):
+
+    def copy(self,text):
+        import pyperclip
+        pyperclip.copy(text)
+
+    def paste(self):
+        import pyperclip
+        return pyperclip.paste()
+
+#backend using command line programs, copied text is written to stdin of copy command
+class CommandBackend(ClipboardBackend):
+    copyCommand=[]
+    pasteCommand=[]
+
+    def copy(self,text):
+        #copy programs fork to own the clipboard, output is not captured
+        #so that run() does not wait for the forked process
+        subprocess.run(self.copyCommand,input=text.encode("utf-8"),stdout=subprocess.DEVNULL,stderr=subprocess.DEVNULL,check=True,timeout=CLIPBOARD_COMMAND_TIMEOUT)
+
+    def paste(self):
+        result=subprocess.run(self.pasteCommand,stdout=subprocess.PIPE,stderr=subprocess.DEVNULL,check=True,timeout=CLIPBOARD_COMMAND_TIMEOUT)
+        return result.stdout.decode("utf-8",errors="replace")
+
+class XclipBackend(CommandBackend):
+    copyCommand=["xclip","-selection","clipboard"]
+    pasteCommand=["xclip","-selection","clipboard","-o"]
+
+class XselBackend(CommandBackend):
+    copyCommand=["xsel","--clipboard","--input"]
+    pasteCommand=["xsel","--clipboard","--output"]
+
+class WlCopyBackend(CommandBackend):
+    copyCommand=["wl-copy"]
+    pasteCommand=["wl-paste","--no-newline"]
+
+class CygwinBackend(ClipboardBackend):
+
+    def copy(self,text):
+        with open(CYGWIN_CLIPBOARD,"w") as clipboardDevice:
+            clipboardDevice.write(text)
+
+    def paste(self):
+        with open(CYGWIN_CLIPBOARD) as clipboardDevice:
+            return clipboardDevice.read()
+
+#in-memory clipboard, used for testing
+class MemoryBackend(ClipboardBackend):
+
+    def __init__(self,text=""):
+        self.text=text
+        self.pasteCount=0
+
+    def copy(self,text):
+        self.text=text
+
+    def paste(self):
+        self.pasteCount=self.pasteCount+1
+        return self.text
+
+CYGWIN_CLIPBOARD="/dev/clipboard"
+CLIPBOARD_COMMAND_TIMEOUT=5
+
+#backend names for clipboard_backend setting
+CLIPBOARD_BACKENDS={
+    "xclip":XclipBackend,
+    "xsel":XselBackend,
+    "wl-copy":WlCopyBackend,
+    "cygwin":CygwinBackend,
+    "pyperclip":PyperclipBackend,
+    "memory":MemoryBackend,
+}
+
+CLIPBOARD_BACKEND=None
+CLIPBOARD_SERVICE=None
+CLIPBOARD_MONITOR=None
+CLEAR_CLIPBOARD_ON_EXIT=True
+
+#auto: use Cygwin clipboard device, wl-copy in Wayland, xclip or xsel in X
+#and pyperclip otherwise
+def createClipboardBackend(name="auto"):
+    if name != "auto":
+        return CLIPBOARD_BACKENDS[name]()
+    if os.path.exists(CYGWIN_CLIPBOARD):
+        return CygwinBackend()
+    if os.environ.get("WAYLAND_DISPLAY") and shutil.which("wl-copy") and shutil.which("wl-paste"):
+        return WlCopyBackend()
+    if os.environ.get("DISPLAY"):
+        if shutil.which("xclip"):
+            return XclipBackend()
+        if shutil.which("xsel"):
+            return XselBackend()
+    return PyperclipBackend()
+
+#backend is created once and used by clipboard service and monitor
+def getClipboardBackend(name="auto"):
+    global CLIPBOARD_BACKEND
+    if CLIPBOARD_BACKEND == None:
+        CLIPBOARD_BACKEND=createClipboardBackend(name)
+    return CLIPBOARD_BACKEND
+
+#set backend, for example MemoryBackend in tests
+def setClipboardBackend(backend):
+    global CLIPBOARD_BACKEND
+    CLIPBOARD_BACKEND=backend
+    if CLIPBOARD_SERVICE != None:
+        CLIPBOARD_SERVICE.backend=backend
+    if CLIPBOARD_MONITOR != None:
+        CLIPBOARD_MONITOR.backend=backend
+
+#copies to clipboard in one worker thread
+#only the latest of queued copies is written to clipboard
+#clipboard is cleared after given seconds if it still has the copied text
+#worker thread does not print because prompt is active, failed is True if
+#latest write failed, it is shown in bottom toolbar
+#scheduled clear is done at exit if CLEAR_CLIPBOARD_ON_EXIT is True, otherwise a warning is printed
+class ClipboardService:
+
+    def __init__(self,backend):
+        self.backend=backend
+        self.failed=False
+        self.queue=queue.Queue()
+        self.thread=None
+        #scheduled clear: monotonic time and text to clear
+        self.clearTime=None
+        self.clearText=None
+
+    def start(self):
+        if self.thread != None:
+            return
+        self.thread=threading.Thread(target=self.run,name="clipboard-service",daemon=True)
+        self.thread.start()
+
+    #queue text to be copied, returns immediately
+    def copy(self,text,clearAfter=0):
+        self.start()
+        self.failed=False
+        self.queue.put(("copy",text,clearAfter))
+
+    #wait until queued copies are written
+    def flush(self,timeout=None):
+        if self.thread == None:
+            return True
+        done=threading.Event()
+        self.queue.put(("flush",done,None))
+        return done.wait(timeout)
+
+    def stop(self):
+        if self.thread == None:
+            return
+        self.queue.put(("stop",None,None))
+        self.thread.join()
+        self.thread=None
+
+    #called at exit, clear timer does not outlive program
+    def exit(self,timeout=None):
+        self.flush(timeout)
+        self.stop()
+        if self.clearTime == None:
+            return
+        if CLEAR_CLIPBOARD_ON_EXIT:
+            self.clearIfUnchanged()
+        else:
+            self.clearTime=None
+            self.clearText=None
+            print("Clipboard is not cleared after program exits. Use agent (--agent) to clear clipboard after given time.")
+
+    def run(self):
+        running=True
+        while running:
+            timeout=None
+            if self.clearTime != None:
+                timeout=max(0,self.clearTime-time.monotonic())
+            try:
+                items=[self.queue.get(timeout=timeout)]
+            except queue.Empty:
+                self.clearIfUnchanged()
+                continue
+            #take all queued requests, earlier copies would be overwritten anyway
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            copies=[item for item in items if item[0] == "copy"]
+            if copies:
+                (action,text,clearAfter)=copies[-1]
+                self.write(text,clearAfter)
+            for (action,value,unused) in items:
+                if action == "flush":
+                    value.set()
+                if action == "stop":
+                    running=False
+
+    def write(self,text,clearAfter):
+        try:
+            self.backend.copy(text)
+        except Exception:
+            self.clearTime=None
+            self.failed=True
+            return
+        self.failed=False
+        if clearAfter > 0:
+            self.clearTime=time.monotonic()+clearAfter
+            self.clearText=text
+        else:
+            self.clearTime=None
+            self.clearText=None
+
+    #do not clear if user has copied something else
+    def clearIfUnchanged(self):
+        clearText=self.clearText
+        self.clearTime=None
+        self.clearText=None
+        try:
+            if self.backend.paste() == clearText:
+                self.backend.copy("")
+        except Exception:
+            pass
+
+#True if latest copy to clipboard failed
+def hasClipboardCopyFailed():
+    return CLIPBOARD_SERVICE != None and CLIPBOARD_SERVICE.failed
+
+def getClipboardService(backendName="auto"):
+    global CLIPBOARD_SERVICE
+    if CLIPBOARD_SERVICE == None:
+        CLIPBOARD_SERVICE=ClipboardService(getClipboardBackend(backendName))
+        #queued copies are written and scheduled clear is done before program exits
+        atexit.register(exitClipboardService)
+    return CLIPBOARD_SERVICE
+
+#also called by agent, it exits using os._exit() that does not run atexit functions
+def exitClipboardService():
+    if CLIPBOARD_SERVICE != None:
+        CLIPBOARD_SERVICE.exit(CLIPBOARD_COMMAND_TIMEOUT)
+
+#False when program exits right after command, copied text is then kept in clipboard
+def setClearClipboardOnExit(clearOnExit):
+    global CLEAR_CLIPBOARD_ON_EXIT
+    CLEAR_CLIPBOARD_ON_EXIT=clearOnExit
+
+#polls clipboard content in daemon thread and caches it
+class ClipboardMonitor:
+
+    def __init__(self,backend,interval):
+        self.backend=backend
+        #do not poll continuously even if interval is 0
+        self.interval=max(interval,0.1)
+        #"-" until clipboard has been read
+        self.text="-"
+        self.stopEvent=threading.Event()
+        self.thread=None
+
+    def start(self):
+        if self.thread != None:
+            return
+        self.stopEvent.clear()
+        self.thread=threading.Thread(target=self.run,name="clipboard-monitor",daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread == None:
+            return
+        self.stopEvent.set()
+        self.thread.join()
+        self.thread=None
+
+    def poll(self):
+        try:
+            self.text=self.backend.paste()
+        except Exception:
+            #clipboard not available, do not print anything because prompt is active
+            self.text="-"
+
+    def run(self):
+        while not self.stopEvent.is_set():
+            self.poll()
+            self.stopEvent.wait(self.interval)
+
+    #cached clipboard content, does not access clipboard
+    def getText(self):
+        return self.text
+
+    #called after copy so that cache is up to date before next poll
+    def setText(self,text):
+        self.text=text
+
+def startClipboardMonitor(interval,backendName="auto"):
+    global CLIPBOARD_MONITOR
+    if CLIPBOARD_MONITOR == None:
+        CLIPBOARD_MONITOR=ClipboardMonitor(getClipboardBackend(backendName),interval)
+    CLIPBOARD_MONITOR.start()
+    return CLIPBOARD_MONITOR
+
+def stopClipboardMonitor():
+    global CLIPBOARD_MONITOR
+    if CLIPBOARD_MONITOR != None:
+        CLIPBOARD_MONITOR.stop()
+        CLIPBOARD_MONITOR=None
+
+def getClipboardMonitor():
+    return CLIPBOARD_MONITOR
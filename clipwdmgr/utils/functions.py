@@ -21,16 +21,20 @@
 #THE SOFTWARE.
 
 #various functions used by the program
-import shutil
 
-from prompt_toolkit import prompt
 
 from ..globals import *
 from ..globals import GlobalVariables
 from ..utils.settings import Settings
 from .utils import *
+from .backups import *
 from ..database.database import *
 
+#prompt_toolkit is imported on first prompt, commands that do not ask input start faster
+def prompt(*args,**kwargs):
+    from prompt_toolkit import prompt
+    return prompt(*args,**kwargs)
+
 
 def printAccountRow(row):
     formatString=getColumnFormatString(2,10,delimiter=" ",align="<")
@@ -67,33 +71,161 @@ def shortenString(string):
         string="%s..." % string[0:columnWidth-3]
     return string
 
-def saveAccounts():
+def saveAccounts(dataKey=None,cipher=None):
     #save accounts
     #selet all accounts from accounts db
-    #encrypt one at a time and save to file
+    #encrypt only new and changed accounts and save to file
+    #other accounts are saved using their encrypted line from password file
+    #all accounts are encrypted if new data key and cipher are given
 
-    createPasswordFileBackups()
+    #password file is replaced by new file, so current file can be linked
+    backupFile=createPasswordFileBackups(link=True)
 
+    key=GlobalVariables.KEY
+    if dataKey==None:
+        header=readVaultHeader(GlobalVariables.CLI_PASSWORD_FILE)
+        if header is None:
+            #password file without header, all accounts are encrypted using new data key
+            dataKey=createDataKey()
+            cipher=getNewVaultCipher()
+        else:
+            dataKey=getDataKey(key)
+            cipher=getHeaderCipher(header)
+    rows=selectAccountsToSave(dataKey)
+    changedRows=[row for (row,token) in rows if token is None]
+    (encryptedAccounts,recordSizes)=encryptAccountRecords(changedRows,dataKey,DATABASE_ACCOUNTS_TABLE_COLUMNS,cipher)
+    debug("Saving %d accounts, %d encrypted" % (len(rows),len(changedRows)))
+    newTokens=iter(encryptedAccounts)
     accounts=[]
-    rows=executeSelect(DATABASE_ACCOUNTS_TABLE_COLUMNS,None,None)
-    for row in rows:
-        encryptedAccount=encryptAccountRow(row)
-        accounts.append(encryptedAccount)
+    for (row,token) in rows:
+        if token is None:
+            token=next(newTokens)
+        accounts.append(token)
+    damagedRecords=getDamagedRecords()
+    if damagedRecords:
+        if isVaultLoaded(key) and dataKey==getDataKey(key):
+            #damaged entries are kept so that they can be recovered from password file
+            accounts.extend(damagedRecords)
+        else:
+            printError("%d damaged entries of password file are not saved using new key. They are in password file backups." % len(damagedRecords))
+            clearDamagedRecords()
 
-    createNewFile(GlobalVariables.CLI_PASSWORD_FILE,accounts)
+    try:
+        createNewFile(GlobalVariables.CLI_PASSWORD_FILE,[makeVaultHeader(key,dataKey,getVaultKdf(),cipher)]+accounts)
+    except:
+        unlinkBackup(backupFile)
+        raise
+    #saved password file does not have journal entries
+    resetJournalEntries()
+    #all accounts were encrypted if data key was changed
+    setAccountCiphertexts(zip([row["rowid"] for row in changedRows],encryptedAccounts,recordSizes),replace=len(changedRows)==len(rows))
+    setSavedCompressionStats()
+    #accounts table is the new content of password file
+    setVaultLoaded(key,dataKey=dataKey)
 
-def encryptAccountRow(row,key=None):
-    #create string of account and encrypt
+def rewriteVaultHeader(newKey):
+    #encrypt data key of loaded password file using new passphrase key or key derivation settings
+    #only password file header changes, accounts are not encrypted again
+    key=GlobalVariables.KEY
+    filename=GlobalVariables.CLI_PASSWORD_FILE
+    vaultLoaded=isVaultLoaded(key)
+    dataKey=getDataKey(key)
+    GlobalVariables.KEY=newKey
+    if dataKey==key:
+        #password file without header
+        saveAccounts()
+        return
+    backupFile=createPasswordFileBackups(link=True)
+    try:
+        (header,accounts)=splitVaultHeader(readFileAsBytes(filename))
+        #new passphrase gets new salt
+        kdf=getVaultKdf(newSalt=newKey!=key)
+        writeFileAtomically(filename,makeVaultHeader(newKey,dataKey,kdf,getHeaderCipher(header)).encode("utf-8")+accounts)
+    except:
+        GlobalVariables.KEY=key
+        unlinkBackup(backupFile)
+        raise
+    if vaultLoaded:
+        setVaultLoaded(newKey)
+
+def saveAccountChanges(updated=[],deleted=[]):
+    #save updated and deleted accounts, given as CREATED values
+    #journal format appends changes to password file, snapshot format saves all accounts
+    if Settings().get(SETTING_VAULT_FORMAT)!=VAULT_FORMAT_JOURNAL:
+        saveAccounts()
+        return
+
+    entries=[]
+    for created in updated:
+        for row in executeQuery(Query(DATABASE_ACCOUNTS_TABLE_COLUMNS).equals(COLUMN_CREATED,created)):
+            entries.append(encodeAccountRow(row,DATABASE_ACCOUNTS_TABLE_COLUMNS,JOURNAL_UPSERT))
+    for created in deleted:
+        entries.append(encodeAccountRow({COLUMN_CREATED:created},operation=JOURNAL_DELETE))
+    appendJournalEntries(entries)
+
+    if getJournalEntries()>=Settings().getInt(SETTING_JOURNAL_COMPACT_ENTRIES):
+        compactAccounts()
+
+def appendJournalEntries(entries):
+    #entries are uncompressed journal records
+    if not entries:
+        return
+    key=GlobalVariables.KEY
+    vaultLoaded=isVaultLoaded(key)
+    (entries,recordSizes)=compressRecords(entries)
+    encryptedEntries=[encryptedEntry.decode("utf-8") for encryptedEntry in getRecordCipher(key).encrypt_many(entries)]
+    (appendStart,appendEnd)=appendStringToFile(GlobalVariables.CLI_PASSWORD_FILE,"\n".join(encryptedEntries))
+    if not vaultLoaded:
+        return
+    if setVaultAppended(key,appendStart,appendEnd):
+        #accounts table already has the changes
+        addJournalEntries(len(entries))
+        addCompressionStats(recordSizes)
+    else:
+        #other process appended to password file, its entries and these entries are applied in file order
+        loadAccounts(key)
+
+def migrateAccounts(cipher):
+    #encrypt all accounts using new data key and given cipher
+    saveAccounts(createDataKey(),cipher)
+
+def compactAccounts():
+    #rewrite password file without journal entries
+    saveAccounts()
+    print("Password file compacted.")
+
+def accountRowToString(row,columns=None):
+    #create string of account using all columns of row or given columns
+    if columns==None:
+        columns=row.keys()
     account=[]
-    for columnName in row.keys():
+    for columnName in columns:
         value=row[columnName]
         if value != None:
             value=str(value)
             value=value.strip()
         account.append("%s:%s" % (columnName,value))
+    return FIELD_DELIM.join(account)
+
+def encryptAccountRow(row,key=None):
+    #create string of account and encrypt
+    if key==None:
+        key=GlobalVariables.KEY
+    return encryptString(key,accountRowToString(row))
+
+def encryptAccountRows(rows,key=None,columns=None):
+    #encrypt many accounts as strings and return list of encrypted strings
+    #exported strings are never compressed so that decrypt and -d print them as text
     if key==None:
         key=GlobalVariables.KEY
-    return encryptString(key,FIELD_DELIM.join(account))
+    accounts=[accountRowToString(row,columns).encode("utf-8") for row in rows]
+    return [encryptedAccount.decode("utf-8") for encryptedAccount in getCipher(key).encrypt_many(accounts)]
+
+def encryptAccountRecords(rows,dataKey,columns,cipher):
+    #encrypt many accounts as password file records
+    #return (encrypted lines, (size, uncompressed size) of records)
+    (accounts,recordSizes)=compressRecords([encodeAccountRow(row,columns) for row in rows])
+    return ([encryptedAccount.decode("utf-8") for encryptedAccount in getCipher(dataKey,cipher).encrypt_many(accounts)],recordSizes)
 
 def makeAccountString(accountDict):
     account=[]
@@ -103,26 +235,19 @@ def makeAccountString(accountDict):
     account=(FIELD_DELIM.join(account))
     return account
 
-def createPasswordFileBackups():
-    #create password backup file
+def createPasswordFileBackups(link=False):
+    #create password backup file, oldest backups are removed
+    #link is used when password file is replaced, appends modify the current file
+    #returns backup file or None
     try:
-        passwordFile=filename=GlobalVariables.CLI_PASSWORD_FILE
-        maxBackups=Settings().get(SETTING_MAX_PASSWORD_FILE_BACKUPS)
-        if os.path.isfile(filename)==False:
-            return
-        currentBackup=maxBackups
-        filenameTemplate="%s-v%s-%d"
-        version=GlobalVariables.VERSION
-        while currentBackup>0:
-            backupFile= filenameTemplate % (passwordFile,version,currentBackup)
-            if os.path.isfile(backupFile) == True:
-                shutil.copy2(backupFile, filenameTemplate % (passwordFile,version,currentBackup+1))
-            debug("Backup file: %s" % backupFile)
-            currentBackup=currentBackup-1
-        shutil.copy2(passwordFile, filenameTemplate % (passwordFile,version,1))
+        maxBackups=Settings().getInt(SETTING_MAX_PASSWORD_FILE_BACKUPS)
+        backupFile=createBackup(GlobalVariables.CLI_PASSWORD_FILE,maxBackups,link)
+        debug("Backup file: %s" % backupFile)
+        return backupFile
     except:
         printError("Password file back up failed.")
         error(fileOnly=True)
+        return None
 
 def modPrompt(field,defaultValue=None):
     promptStr=""
@@ -22,8 +22,6 @@
 
 #set keybindings 
 
-import webbrowser
-
 from prompt_toolkit.key_binding import KeyBindings
 from prompt_toolkit.application import run_in_terminal
 
@@ -104,6 +102,7 @@ def setKeyBindings():
                 return
 
             print("Opening URL '%s'..." % GlobalVariables.LAST_ACCOUNT_VIEWED_URL)
+            import webbrowser
             webbrowser.open_new_tab(GlobalVariables.LAST_ACCOUNT_VIEWED_URL)
 
         run_in_terminal(openUrl)
@@ -30,29 +30,42 @@ import os
 
 from ..globals import *
 from .utils import *
+from .atomicfile import *
 
+#settings read from settings file, shared by all Settings objects
+#tuple (settings file, modification time, size, settings dictionary)
+#settings file is read again only when it changes
+SETTINGS_SNAPSHOT=None
 
 class Settings:
 
     def getSettingsFile(self):
         return "%s/%s" % (GlobalVariables.CLIPWDMGR_DATA_DIR,CLIPWDMGR_SETTINGS_FILE_NAME)
 
-    def readSettingsFile(self):
-
-        #read JSON file and return dictionary
+    def getSettings(self):
+        #return cached settings dictionary, do not modify it
+        global SETTINGS_SNAPSHOT
         settingsFile=self.getSettingsFile()
-        if os.path.isfile(settingsFile):
-            jsonDict=json.load(open(settingsFile,'r'))
-        else:
-            jsonDict={}
+        try:
+            stat=os.stat(settingsFile)
+        except OSError:
             #file does not exist
             #get defaults and save
+            jsonDict={}
             settingNames=list(SETTING_DEFAULT_VALUES.keys())
             for name in settingNames:
                 jsonDict[name]=SETTING_DEFAULT_VALUES[name]
             self.saveSettingsFile(jsonDict)
-        
-        return jsonDict
+            return SETTINGS_SNAPSHOT[3]
+        if SETTINGS_SNAPSHOT is None or SETTINGS_SNAPSHOT[0:3] != (settingsFile,stat.st_mtime_ns,stat.st_size):
+            with open(settingsFile,'r') as file:
+                jsonDict=json.load(file)
+            SETTINGS_SNAPSHOT=(settingsFile,stat.st_mtime_ns,stat.st_size,jsonDict)
+        return SETTINGS_SNAPSHOT[3]
+
+    def readSettingsFile(self):
+        #return copy of settings dictionary
+        return dict(self.getSettings())
 
     def resetSettings(self):
         jsonDict={}
@@ -63,10 +76,13 @@ class Settings:
         self.saveSettingsFile(jsonDict)
 
     def saveSettingsFile(self,jsonDict):
-
         #save json to settings file
-        settingsFile="%s/%s" % (GlobalVariables.CLIPWDMGR_DATA_DIR,CLIPWDMGR_SETTINGS_FILE_NAME)
-        jsonDict=json.dump(jsonDict,open(settingsFile,'w'), sort_keys=True, indent=4)
+        #write to temporary file and rename, so settings file is always complete
+        global SETTINGS_SNAPSHOT
+        settingsFile=self.getSettingsFile()
+        writeFileAtomically(settingsFile,json.dumps(jsonDict,sort_keys=True,indent=4).encode("utf-8"))
+        stat=os.stat(settingsFile)
+        SETTINGS_SNAPSHOT=(settingsFile,stat.st_mtime_ns,stat.st_size,dict(jsonDict))
         
     def getInt(self,settingName):
         return int(self.get(settingName))
@@ -76,17 +92,17 @@ class Settings:
         return stringValue.lower() in ("yes","y","true", "on", "t", "1")
 
     def get(self,settingName):
-        settingsDict=self.readSettingsFile()
+        settingsDict=self.getSettings()
 
         #TODO: if seting is columnwidth and another setting autowidth then calculate column
         #width from terminal size
 
+        if settingName not in settingsDict:
+            #setting added in newer version, not yet in settings file
+            return SETTING_DEFAULT_VALUES[settingName]
         return settingsDict[settingName]
 
     def set(self,settingName,settingValue):
         settingsDict=self.readSettingsFile()
         settingsDict[settingName]=settingValue
         self.saveSettingsFile(settingsDict)
-
-
-
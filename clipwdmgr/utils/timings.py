@@ -0,0 +1,74 @@
+#The MIT License (MIT)
+#
+#Copyright (c) 2015,2018 Sami Salkosuo
+#
+#Permission is hereby granted, free of charge, to any person obtaining a copy
+#of this software and associated documentation files (the "Software"), to deal
+#in the Software without restriction, including without limitation the rights
+#to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#copies of the Software, and to permit persons to whom the Software is
+#furnished to do so, subject to the following conditions:
+#
+#The above copyright notice and this permission notice shall be included in
+#all copies or substantial portions of the Software.
+#
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#THE SOFTWARE.
+
+#
+#timings
+#
+#startup phase timings, printed to stderr when using --timings option
+#
+
+import sys
+import time
+import contextlib
+
+#(phase name, seconds)
+TIMINGS=[]
+START_TIME=None
+
+def startTimings(startTime=None):
+    global START_TIME
+    if startTime == None:
+        startTime=time.perf_counter()
+    START_TIME=startTime
+
+def addTiming(phase,startTime):
+    TIMINGS.append((phase,time.perf_counter()-startTime))
+
+@contextlib.contextmanager
+def timing(phase):
+    startTime=time.perf_counter()
+    try:
+        yield
+    finally:
+        addTiming(phase,startTime)
+
+#print phases, total and startup budget of mode
+#phases listed in excludedPhases, like asking passphrase, are not counted against the budget
+def printTimings(mode=None,budget=None,excludedPhases=[]):
+    if START_TIME == None:
+        return
+    total=time.perf_counter()-START_TIME
+    excluded=0.0
+    out=sys.stderr
+    print("Timings:",file=out)
+    for (phase,seconds) in TIMINGS:
+        if phase in excludedPhases:
+            excluded=excluded+seconds
+            phase="%s (excluded)" % phase
+        print("  {:<30} {:>8.1f} ms".format(phase,seconds*1000),file=out)
+    print("  {:<30} {:>8.1f} ms".format("total",total*1000),file=out)
+    if budget != None:
+        counted=total-excluded
+        status="ok"
+        if counted > budget:
+            status="OVER BUDGET"
+        print("  {:<30} {:>8.1f} ms, budget {:.0f} ms: {}".format("startup (%s)" % mode,counted*1000,budget*1000,status),file=out)
@@ -28,6 +28,8 @@ import argparse
 import random
 
 from .settings import Settings
+from .clipboard import *
+from .atomicfile import *
 from ..globals import *
 
 #from: http://stackoverflow.com/a/14728477
@@ -86,25 +88,21 @@ def printDictionary(dictionary,indent=""):
 
 def createNewFile(filename, lines=[]):
     fileExisted=os.path.isfile(filename)
-    file=open(filename,"w",encoding="utf-8")
-    file.write("\n".join(lines))
-    file.close()
+    writeFileAtomically(filename,"\n".join(lines).encode("utf-8"))
     if fileExisted:
         debug("File overwritten: %s" % filename)
     else:
         debug("Created new file: %s" % filename)
 
 def appendToFile(filename, lines=[]):
-    file=open(filename,"a",encoding="utf-8")
-    file.write("\n")
-    file.write("\n".join(lines))
-    file.close()
+    appendStringToFile(filename,"\n".join(lines))
 
 def appendStringToFile(filename, str):
-    file=open(filename,"a",encoding="utf-8")
-    file.write("\n")
-    file.write(str)
-    file.close()
+    #returns (file offset where appended string starts, file offset after it)
+    durable=Settings().getBoolean(SETTING_DURABLE_APPENDS)
+    data=("\n"+str).encode("utf-8")
+    end=appendToFileAtomically(filename,data,durable)
+    return (end-len(data),end)
 
 def readFileAsString(filename):
     file=open(filename,"r",encoding="utf-8")
@@ -114,6 +112,14 @@ def readFileAsString(filename):
     file.close()
     return "".join(lines)
 
+def readFileAsBytes(filename,offset=0,length=-1):
+    #read file content starting from offset as bytes
+    file=open(filename,"rb")
+    file.seek(offset)
+    content=file.read(length)
+    file.close()
+    return content
+
 def readFileAsList(filename):
     file=open(filename,"r",encoding="utf-8")
     lines=[]
@@ -269,43 +275,46 @@ def pwdPasswordWordLike(format="CVCV/nnnn/AAAA"):
     return generate_username_case_sensitive(format)
 
 
-def copyToClipboard(stringToCopy,infoMessage=None,account=None,clipboardContent=None):
+#copy is queued to clipboard service and this returns immediately
+#clearAfter: seconds until clipboard is cleared, None=use setting, 0=do not clear
+def copyToClipboard(stringToCopy,infoMessage=None,account=None,clipboardContent=None,clearAfter=None):
     if Settings().get(SETTING_ENABLE_CLIPBOARD_COPY)==True:
 
         if stringToCopy=="" or stringToCopy == None:
             print("Nothing to copy to clipboard.")
             return False
 
-        cygwinClipboard="/dev/clipboard"
-        if os.path.exists(cygwinClipboard):
-            clipboardDevice = open(cygwinClipboard, "w")
-            clipboardDevice.write(stringToCopy)
-            if infoMessage != None:
-                print(infoMessage)
-            if account!=None and clipboardContent!=None:
-                GlobalVariables.COPIED_TO_CLIPBOARD="%s of' %s'" % (clipboardContent,account)
-        else:
-            try:
-                import pyperclip
-                pyperclip.copy(stringToCopy)
-                GlobalVariables.REAL_CONTENT_OF_CLIPBOARD=stringToCopy
-                if infoMessage != None:
-                    print(infoMessage)
-                if account!=None and clipboardContent!=None:
-                    if account!='':
-                        GlobalVariables.COPIED_TO_CLIPBOARD="%s of '%s'" % (clipboardContent,account)
-                    else:
-                        GlobalVariables.COPIED_TO_CLIPBOARD="%s" % (clipboardContent)
-                        
-            except:
+        if clearAfter == None:
+            clearAfter=Settings().getInt(SETTING_CLIPBOARD_CLEAR_SECONDS)
+        service=getClipboardService(Settings().get(SETTING_CLIPBOARD_BACKEND))
+        service.copy(stringToCopy,clearAfter)
+        monitor=getClipboardMonitor()
+        if monitor == None:
+            #no prompt and toolbar, wait for copy so that result can be printed
+            if not service.flush(CLIPBOARD_COMMAND_TIMEOUT) or service.failed:
                 print("Error copying to clipboard.")
+                return False
+        GlobalVariables.REAL_CONTENT_OF_CLIPBOARD=stringToCopy
+        if monitor != None:
+            #copy failure is shown in toolbar
+            monitor.setText(stringToCopy)
+        if infoMessage != None:
+            print(infoMessage)
+        if account!=None and clipboardContent!=None:
+            if account!='':
+                GlobalVariables.COPIED_TO_CLIPBOARD="%s of '%s'" % (clipboardContent,account)
+            else:
+                GlobalVariables.COPIED_TO_CLIPBOARD="%s" % (clipboardContent)
     
     return True
 
 def getClipboardText():
+    monitor=getClipboardMonitor()
+    if monitor != None:
+        #cached by clipboard monitor
+        return monitor.getText()
     try:
-        import pyperclip
-        text=pyperclip.paste()
+        text=getClipboardBackend(Settings().get(SETTING_CLIPBOARD_BACKEND)).paste()
         return text
     except:
         print("Error accessing clipboard.")